@@ -0,0 +1,65 @@
+import numpy as np
+import math
+from functools import lru_cache
+
+class SpectrumEngine:
+    """Window, band-edge table and band reduction precomputed for one configuration.
+
+    Instances are shared between analysers, so they hold no per-call state;
+    callers pass their own scratch buffers to stay allocation-free.
+    """
+
+    def __init__(self, fft_size, rate, freq_bands):
+        self.fft_size = fft_size
+        self.rate = rate
+        self.freq_bands = freq_bands
+        self.window = np.hanning(fft_size)
+        self.spectrum_len = fft_size // 2 + 1
+        self.band_edges = self._band_edges(self.spectrum_len, freq_bands)
+        # Each row averages the spectrum bins of one band; empty bands stay zero.
+        self.band_matrix = np.zeros((freq_bands, self.spectrum_len))
+        for i, (start, end) in enumerate(self.band_edges):
+            if end > start:
+                self.band_matrix[i, start:end] = 1.0 / (end - start)
+        self.window.flags.writeable = False
+        self.band_matrix.flags.writeable = False
+
+    @staticmethod
+    def _band_edges(spectrum_len, freq_bands):
+        edges = []
+        for i in range(freq_bands):
+            start = int(math.pow(spectrum_len, i / freq_bands))
+            end = int(math.pow(spectrum_len, (i + 1) / freq_bands))
+            edges.append((start, end))
+        return edges
+
+    def scratch(self):
+        """Allocate the (windowed, magnitude) buffers used by band_magnitudes."""
+        return np.empty(self.fft_size), np.empty(self.spectrum_len)
+
+    def band_magnitudes(self, samples, out=None, scratch=None):
+        """Mean windowed-FFT magnitude per band for one fft_size frame."""
+        windowed, magnitude = scratch if scratch is not None else self.scratch()
+        np.multiply(samples[:self.fft_size], self.window, out=windowed)
+        np.abs(np.fft.rfft(windowed), out=magnitude)
+        if out is None:
+            out = np.empty(self.freq_bands)
+        return np.dot(self.band_matrix, magnitude, out=out)
+
+    def band_magnitudes_batch(self, frames, out=None, windowed=None):
+        """Band magnitudes for a 2-D (n_frames, >= fft_size) array in one rfft call.
+
+        Rows may be strided views such as de-interleaved channels; `out` and
+        `windowed` are optional (n_frames, freq_bands) / (n_frames, fft_size) buffers.
+        """
+        if windowed is None:
+            windowed = frames[:, :self.fft_size] * self.window
+        else:
+            np.multiply(frames[:, :self.fft_size], self.window, out=windowed)
+        magnitude = np.abs(np.fft.rfft(windowed, axis=1))
+        return np.matmul(magnitude, self.band_matrix.T, out=out)
+
+@lru_cache(maxsize=None)
+def get_engine(fft_size, rate, freq_bands):
+    """Shared SpectrumEngine for (fft_size, rate, freq_bands)."""
+    return SpectrumEngine(fft_size, rate, freq_bands)
@@ -0,0 +1,387 @@
+import numpy as np
+import multiprocessing
+import threading
+import time
+import logging
+from multiprocessing import shared_memory
+from audio_analysis import AudioAnalysis, normalized_volume
+from audio_sources import AudioSource, create_source, source_rate
+from onsets import Onset, beat_phase
+
+logging.basicConfig(level=logging.INFO)
+
+# Scalar slots of the shared feature block, in order.
+SCALARS = ('volume', 'dynamic_range', 'stream_time', 'beat_period', 'beat_anchor',
+           'max_volume', 'noise_floor', 'calibrated', 'calibration_seconds', 'heartbeat',
+           'processed', 'dropped', 'overflows', 'latency_ms', 'max_latency_ms',
+           'process_ms', 'onsets', 'onset_latency_ms', 'onset_max_latency_ms')
+_SLOT = {name: i for i, name in enumerate(SCALARS)}
+_ONSET_FIELDS = 4  # time, strength, captured_at, detected_at
+HISTOGRAM_BINS = 256  # StreamingQuantiles bins behind the child's calibration
+
+def process_device(spec):
+    """Calibration profile key of an AnalysisProcess capturing SPEC; only a microphone has one."""
+    return f"process:{spec}" if spec == 'mic' else None
+
+class SharedFeatures:
+    """Analysis features in a multiprocessing.shared_memory block guarded by a seqlock.
+
+    Layout: int64 (sequence, onset_count), then float64 scalars, band data, a
+    ring of the most recent onsets and the calibration histogram. The single writer makes the sequence
+    odd while it writes and even again when done; readers copy the block into
+    a preallocated local buffer and retry if the sequence moved, so reads
+    never block the writer and never see a torn frame.
+    """
+
+    def __init__(self, freq_bands=16, onset_slots=64, name=None, histogram_bins=HISTOGRAM_BINS):
+        self.freq_bands = freq_bands
+        self.onset_slots = onset_slots
+        onsets_end = len(SCALARS) + freq_bands + onset_slots * _ONSET_FIELDS
+        floats = onsets_end + histogram_bins
+        size = 16 + floats * 8
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+        buffer = self.shm.buf
+        self.header = np.ndarray(2, dtype=np.int64, buffer=buffer)
+        self.data = np.ndarray(floats, dtype=np.float64, buffer=buffer, offset=16)
+        self.scalars = self.data[:len(SCALARS)]
+        self.freq_data = self.data[len(SCALARS):len(SCALARS) + freq_bands]
+        self.onset_ring = self.data[len(SCALARS) + freq_bands:onsets_end].reshape(onset_slots, _ONSET_FIELDS)
+        self.histogram = self.data[onsets_end:]
+        if self.owner:
+            self.header[:] = 0
+            self.data[:] = 0
+            # AudioAnalysis defaults, so readers are sane before the child first publishes.
+            self.set('max_volume', 5000)
+            self.set('noise_floor', 500)
+            self.set('dynamic_range', 1.0)
+        # Reader side: one consistent copy of the block.
+        self.local = np.zeros(floats)
+        self.local_scalars = self.local[:len(SCALARS)]
+        self.local_freq = self.local[len(SCALARS):len(SCALARS) + freq_bands]
+        self.local_onsets = self.local[len(SCALARS) + freq_bands:onsets_end].reshape(onset_slots, _ONSET_FIELDS)
+        self.local_histogram = self.local[onsets_end:]
+        self.local_onset_count = 0
+
+    def begin_write(self):
+        self.header[0] += 1
+
+    def end_write(self):
+        self.header[0] += 1
+
+    def set(self, name, value):
+        self.scalars[_SLOT[name]] = value
+
+    def push_onset(self, onset):
+        """Append one Onset to the ring; call between begin_write and end_write."""
+        count = int(self.header[1])
+        self.onset_ring[count % self.onset_slots] = (onset.time, onset.strength, onset.captured_at, onset.detected_at)
+        self.header[1] = count + 1
+
+    def read(self, attempts=1000):
+        """Refresh the local copy from shared memory; return the sequence it was taken at.
+
+        Returns None and keeps the previous copy if no consistent read was
+        possible, e.g. because the writer died in the middle of a write.
+        """
+        for _ in range(attempts):
+            sequence = int(self.header[0])
+            if sequence & 1:
+                continue
+            np.copyto(self.local, self.data)
+            onset_count = int(self.header[1])
+            if int(self.header[0]) == sequence:
+                self.local_onset_count = onset_count
+                return sequence
+        return None
+
+    def reset_writer(self):
+        """Release a write left half-done by a writer that died; only call while no writer runs."""
+        if self.header[0] & 1:
+            self.header[0] += 1
+
+    def get(self, name):
+        """Scalar from the last read()."""
+        return float(self.local_scalars[_SLOT[name]])
+
+    def close(self):
+        # Drop the numpy views first; the mmap cannot close while they export its buffer.
+        self.header = self.data = self.scalars = self.freq_data = self.onset_ring = self.histogram = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class FeaturePublisher:
+    """Processor wrapper that runs AudioAnalysis and publishes every result to SharedFeatures.
+
+    The feeder thread and the status loop both publish, so a lock keeps them
+    from interleaving; the seqlock itself assumes a single writer.
+    """
+
+    def __init__(self, analysis, shared):
+        self.analysis = analysis
+        self.shared = shared
+        self.process_ms = 0.0
+        self._lock = threading.Lock()
+
+    def process_audio(self, in_data, captured_at=None):
+        started = time.perf_counter()
+        analysis = self.analysis
+        analysis.process_audio(in_data, captured_at)
+        shared = self.shared
+        with self._lock:
+            shared.begin_write()
+            try:
+                shared.set('volume', analysis.volume)
+                shared.set('dynamic_range', analysis.dynamic_range)
+                shared.freq_data[:] = analysis.freq_data
+                shared.set('stream_time', analysis.onsets.stream_time)
+                shared.set('beat_period', analysis.onsets.beat_period)
+                shared.set('beat_anchor', analysis.onsets.beat_anchor)
+                for onset in analysis.get_onsets():
+                    shared.push_onset(onset)
+            finally:
+                shared.end_write()
+        self.process_ms += ((time.perf_counter() - started) * 1000 - self.process_ms) * 0.05
+
+    def publish_status(self, source):
+        """Heartbeat plus calibration and source statistics, written a few times per second."""
+        stats = source.stats()
+        onset = self.analysis.onset_stats()
+        calibration = self.analysis.calibration_stats()
+        shared = self.shared
+        with self._lock:
+            shared.begin_write()
+            try:
+                shared.set('max_volume', self.analysis.max_volume)
+                shared.set('noise_floor', self.analysis.noise_floor)
+                shared.set('calibrated', 1.0 if calibration['ready'] or calibration['from_profile'] else 0.0)
+                shared.set('calibration_seconds', calibration['seconds'])
+                if calibration['histogram'].size == shared.histogram.size:
+                    shared.histogram[:] = calibration['histogram'].ravel()
+                shared.set('heartbeat', time.perf_counter())
+                shared.set('processed', stats.get('processed', stats.get('chunks', 0)))
+                shared.set('dropped', stats.get('dropped', 0))
+                shared.set('overflows', stats.get('overflows', 0))
+                shared.set('latency_ms', stats.get('latency_ms', 0.0))
+                shared.set('max_latency_ms', stats.get('max_latency_ms', 0.0))
+                shared.set('process_ms', self.process_ms)
+                shared.set('onsets', onset['onsets'])
+                shared.set('onset_latency_ms', onset['avg_latency_ms'])
+                shared.set('onset_max_latency_ms', onset['max_latency_ms'])
+            finally:
+                shared.end_write()
+
+
+def _run_child(config, stop_event):
+    """Child process body: capture, analyse and publish until stop_event is set."""
+    shared = SharedFeatures(config['freq_bands'], config['onset_slots'], name=config['shm_name'])
+    analysis = AudioAnalysis(config['chunk'], config['rate'])
+    publisher = FeaturePublisher(analysis, shared)
+    source = None
+    try:
+        # Starts from a saved profile, or after a crash from what the previous run measured.
+        analysis.start_calibration(config['calibration_seconds'], config['calibration'])
+        source = create_source(config['spec'], config['rate'], config['chunk'], publisher, **config['source_options'])
+        while not stop_event.is_set():
+            publisher.publish_status(source)
+            stop_event.wait(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if source is not None:
+            source.close()
+        publisher = analysis = None
+        shared.close()
+
+
+class AnalysisProcess(AudioSource):
+    """Capture and AudioAnalysis in a child process, read back through shared memory.
+
+    Stands in for both the audio source and the AudioAnalysis in VoiceArt:
+    the render loop only copies the shared feature block, so rendering and
+    analysis no longer contend for one GIL. poll() runs once per frame and
+    restarts the child if it exits or its heartbeat stalls, reusing the
+    calibration it published.
+    """
+
+    name = "process"
+
+    def __init__(self, spec, rate=44100, chunk=1024, freq_bands=16, onset_slots=64, calibration_seconds=3,
+                 heartbeat_timeout=2.0, max_restarts=5, calibration=None, **source_options):
+        if spec.startswith('raw:-'):
+            raise ValueError("raw:- reads stdin, which is not available to the analysis process")
+        # The child analyses at the rate its source delivers, e.g. a 48 kHz WAV.
+        rate = source_rate(spec, rate, source_options.get('raw_rate'))
+        super().__init__(rate, chunk)
+        self.name = f"process:{spec}"
+        self.shared = SharedFeatures(freq_bands, onset_slots)
+        self.config = {
+            'shm_name': self.shared.name, 'freq_bands': freq_bands, 'onset_slots': onset_slots,
+            'spec': spec, 'rate': rate, 'chunk': chunk, 'source_options': source_options,
+            'calibration': calibration, 'calibration_seconds': calibration_seconds,
+        }
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.profiler = None
+        # Spawn rather than fork: the parent already holds SDL and audio state.
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = None
+        self.process = None
+        self._onset_cursor = 0
+        self._start()
+
+    def _start(self):
+        # A fresh Event per child: one killed inside Event.wait() leaves the old one unusable.
+        self._stop_event = self._context.Event()
+        shared = self.shared
+        shared.reset_writer()
+        shared.begin_write()
+        shared.set('heartbeat', 0.0)
+        shared.end_write()
+        self.process = self._context.Process(target=_run_child, args=(self.config, self._stop_event),
+                                             name="AudioAnalysisProcess", daemon=True)
+        self.process.start()
+        self._started_at = time.perf_counter()
+        logging.info(f"Analysis process started (pid {self.process.pid}).")
+
+    def _refresh(self):
+        self.shared.read()
+
+    def poll(self):
+        """Restart the child if it died or stopped publishing."""
+        if self.process is None:
+            return
+        self._refresh()
+        heartbeat = self.shared.get('heartbeat')
+        now = time.perf_counter()
+        if self.process.is_alive():
+            last_sign = heartbeat if heartbeat else self._started_at
+            # Spawning re-imports numpy and opens the device, so allow extra time before the first beat.
+            timeout = self.heartbeat_timeout if heartbeat else self.heartbeat_timeout + 10
+            if now - last_sign < timeout:
+                return
+            logging.warning("Analysis process stopped responding; killing it.")
+            # It is not reacting anyway, and a stopped process would ignore SIGTERM and stall this frame.
+            self.process.kill()
+            self.process.join(1.0)
+        else:
+            logging.warning(f"Analysis process exited with code {self.process.exitcode}.")
+        if self.shared.get('calibrated'):
+            self.config['calibration'] = self._calibration_profile()
+        if self.restarts >= self.max_restarts:
+            logging.error("Analysis process keeps failing; giving up.")
+            self.process = None
+            return
+        self.restarts += 1
+        self._start()
+
+    def start_calibration(self, duration=3, profile=None):
+        """The child calibrates in the background from the start; pass a saved profile to the constructor."""
+
+    @property
+    def device(self):
+        return process_device(self.config['spec'])
+
+    def _histogram(self):
+        histogram = self.shared.local_histogram
+        return histogram.reshape(1, -1).copy() if histogram.any() else None
+
+    def _calibration_profile(self):
+        # With the histogram a restarted child carries on refining instead of listening from scratch.
+        return {'max_volume': [self.shared.get('max_volume')], 'noise_floor': [self.shared.get('noise_floor')],
+                'seconds': self.shared.get('calibration_seconds'), 'histogram': self._histogram()}
+
+    def calibration_stats(self):
+        return {'ready': bool(self.shared.get('calibrated')), 'seconds': self.shared.get('calibration_seconds'),
+                'duration': self.config['calibration_seconds'], 'from_profile': self.config['calibration'] is not None,
+                'max_volume': np.array([self.max_volume]), 'noise_floor': np.array([self.noise_floor]),
+                'histogram': self._histogram()}
+
+    def _fallback(self, name):
+        # Until the child has published, use the profile it was started with.
+        if self.config['calibration'] and not self.shared.get('calibrated'):
+            return float(np.ravel(self.config['calibration'][name])[0])
+        return self.shared.get(name)
+
+    @property
+    def max_volume(self):
+        return self._fallback('max_volume')
+
+    @property
+    def noise_floor(self):
+        return self._fallback('noise_floor')
+
+    def get_volume(self):
+        self._refresh()
+        shared = self.shared
+        return normalized_volume(shared.get('volume'), shared.get('dynamic_range'), self.noise_floor, self.max_volume)
+
+    def get_frequency_data(self):
+        self._refresh()
+        return self.shared.local_freq.copy()
+
+    def get_onsets(self):
+        """Onsets published since the last call; older ones are lost if more than the ring size arrived."""
+        self._refresh()
+        shared = self.shared
+        count = shared.local_onset_count
+        if count < self._onset_cursor:
+            # The block was reset; start over.
+            self._onset_cursor = 0
+        first = max(self._onset_cursor, count - shared.onset_slots)
+        self._onset_cursor = count
+        return [Onset(*shared.local_onsets[i % shared.onset_slots].tolist()) for i in range(first, count)]
+
+    def get_beat_phase(self):
+        self._refresh()
+        shared = self.shared
+        return beat_phase(shared.get('stream_time'), shared.get('beat_period'), shared.get('beat_anchor'))
+
+    def get_tempo(self):
+        self._refresh()
+        period = self.shared.get('beat_period')
+        return 60.0 / period if period else 0.0
+
+    def onset_stats(self):
+        shared = self.shared
+        return {
+            'onsets': int(shared.get('onsets')),
+            'tempo_bpm': self.get_tempo(),
+            'avg_latency_ms': shared.get('onset_latency_ms'),
+            'max_latency_ms': shared.get('onset_max_latency_ms'),
+        }
+
+    def stats(self):
+        self._refresh()
+        shared = self.shared
+        return {
+            'processed': int(shared.get('processed')),
+            'dropped': int(shared.get('dropped')),
+            'overflows': int(shared.get('overflows')),
+            'latency_ms': shared.get('latency_ms'),
+            'max_latency_ms': shared.get('max_latency_ms'),
+            'process_ms': shared.get('process_ms'),
+            'restarts': self.restarts,
+            'alive': self.process is not None and self.process.is_alive(),
+        }
+
+    def close(self):
+        if self.process is not None:
+            self._stop_event.set()
+            self.process.join(2.0)
+            if self.process.is_alive():
+                logging.warning("Analysis process did not stop; terminating it.")
+                self.process.terminate()
+                self.process.join(1.0)
+                if self.process.is_alive():
+                    self.process.kill()
+                    self.process.join(1.0)
+            self.process = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+        logging.info("Analysis process closed.")
@@ -2,58 +2,188 @@ import numpy as np
 import time
 import math
 import logging
+from numpy.lib.stride_tricks import sliding_window_view
+from analysis_engine import get_engine
+from onsets import OnsetDetector, beat_phase
+from calibration import VolumeCalibration
 
 logging.basicConfig(level=logging.INFO)
 
+def normalized_volume(volume, dynamic_range, noise_floor, max_volume):
+    """Map a smoothed RMS volume to 0..1 against the calibrated noise floor and maximum."""
+    if volume < noise_floor * 1.2:  # Stricter noise gate
+        return 0
+    normalized = (volume - noise_floor) / (max_volume - noise_floor)
+    return max(0, min(1, normalized * dynamic_range))
+
+class AnalysisSnapshot:
+    """One published set of analysis results."""
+    __slots__ = ('volume', 'dynamic_range', 'freq_data', 'stream_time', 'beat_period', 'beat_anchor')
+
+    def __init__(self, freq_bands):
+        self.volume = 0
+        self.dynamic_range = 1.0
+        self.freq_data = np.zeros(freq_bands)
+        self.stream_time = 0.0
+        self.beat_period = 0.0
+        self.beat_anchor = 0.0
+
 class AudioAnalysis:
-    def __init__(self, chunk=1024, rate=44100):
+    rows = 1  # volumes analysed per chunk
+
+    def __init__(self, chunk=1024, rate=44100, hop_size=256):
         self.rate = rate
         self.chunk = chunk
         self.max_volume = 5000
         self.noise_floor = 500
-        self.volume_history = [0] * 10
+        self.volume_history = np.zeros(10)
+        self._volume_index = 0
         self.fft_size = self.chunk
         self.freq_bands = 16
         self.band_history = np.zeros((self.freq_bands, 5))
+        self._band_index = 0
+        self.engine = get_engine(self.fft_size, self.rate, self.freq_bands)
+        self._samples = np.zeros(self.chunk)
+        self._scratch = self.engine.scratch()
+        self._bands = np.zeros(self.freq_bands)
         self.audio_data = np.zeros(self.chunk, dtype=np.int16)
         self.volume = 0
         self.freq_data = np.zeros(self.freq_bands)
         self.dynamic_range = 1.0  # New: Adjusts sensitivity dynamically
+        # Onsets run on their own overlapping frames, so attacks are not delayed by the smoothing above.
+        self.onsets = OnsetDetector(rate, frame_size=self.fft_size, hop_size=hop_size)
+        # Double-buffered results: the analysis thread fills the back buffer and
+        # bumps the sequence number; readers use the buffer selected by it.
+        self._snapshots = [AnalysisSnapshot(self.freq_bands), AnalysisSnapshot(self.freq_bands)]
+        self._sequence = 0
+        self.profiler = None
+        self.calibration = None
+
+    def process_audio(self, in_data, captured_at=None):
+        """Process audio data with improved accuracy.
 
-    def process_audio(self, in_data):
-        """Process audio data with improved accuracy."""
+        `captured_at` is the perf_counter() time the chunk was captured, used
+        to report onset latency; it defaults to now.
+        """
+        started = time.perf_counter()
         try:
             audio_array = np.frombuffer(in_data, dtype=np.int16)
             self.audio_data = audio_array
-            rms = np.sqrt(np.mean(np.square(audio_array)))
-            self.volume_history.pop(0)
-            self.volume_history.append(rms)
-            self.volume = sum(self.volume_history) / len(self.volume_history)
+            n = len(audio_array)
+            if n == 0:
+                return
+            if n <= self.chunk:
+                samples = self._samples[:n]
+                np.copyto(samples, audio_array)
+            else:
+                samples = audio_array.astype(np.float64)
+            rms = math.sqrt(np.dot(samples, samples) / n)
+            self.volume_history[self._volume_index] = rms
+            self._volume_index = (self._volume_index + 1) % len(self.volume_history)
+            self.volume = np.add.reduce(self.volume_history) / len(self.volume_history)
+            if self.calibration is not None and self.calibration.add(self.volume):
+                self.apply_calibration(*self.calibration.estimate())
 
             # Dynamic range adjustment
             if self.volume > self.noise_floor:
                 self.dynamic_range = max(0.5, min(2.0, self.volume / self.max_volume))
 
-            if len(audio_array) >= self.fft_size:
-                window = np.hanning(self.fft_size)
-                windowed = audio_array[:self.fft_size] * window
-                spectrum = np.abs(np.fft.rfft(windowed))
-                spectrum_len = len(spectrum)
-                freq_data = np.zeros(self.freq_bands)
-
-                for i in range(self.freq_bands):
-                    start = int(math.pow(spectrum_len, i / self.freq_bands))
-                    end = int(math.pow(spectrum_len, (i + 1) / self.freq_bands))
-                    if end > start:
-                        freq_data[i] = np.mean(spectrum[start:end])
-
-                if np.max(freq_data) > 0:
-                    freq_data = freq_data / np.max(freq_data) * self.dynamic_range
-                self.band_history = np.roll(self.band_history, 1, axis=1)
-                self.band_history[:, 0] = freq_data
-                self.freq_data = np.mean(self.band_history, axis=1)
+            if n >= self.fft_size:
+                freq_data = self.engine.band_magnitudes(samples, out=self._bands, scratch=self._scratch)
+                peak = np.maximum.reduce(freq_data)
+                if peak > 0:
+                    np.divide(freq_data, peak, out=freq_data)
+                    np.multiply(freq_data, self.dynamic_range, out=freq_data)
+                self.band_history[:, self._band_index] = freq_data
+                depth = self.band_history.shape[1]
+                self._band_index = (self._band_index + 1) % depth
+                np.add.reduce(self.band_history, axis=1, out=self.freq_data)
+                np.divide(self.freq_data, depth, out=self.freq_data)
+            self.onsets.process(samples, started if captured_at is None else captured_at)
+            self._publish()
         except Exception as e:
             logging.error(f"Audio processing error: {e}")
+        finally:
+            if self.profiler:
+                self.profiler.record('process_audio', time.perf_counter() - started)
+
+    def process_batch(self, frames):
+        """Process many chunks in one call.
+
+        `frames` is raw int16 bytes or an array reshaped to (n_chunks, chunk).
+        Returns the per-chunk smoothed volumes and frequency data; the analysis
+        state afterwards matches calling process_audio once per chunk.
+        """
+        frames = np.asarray(np.frombuffer(frames, dtype=np.int16) if isinstance(frames, (bytes, bytearray, memoryview)) else frames)
+        frames = frames.reshape(-1, frames.shape[-1] if frames.ndim > 1 else self.chunk)
+        count, length = frames.shape
+        if count == 0 or length == 0:
+            return np.zeros(0), np.zeros((0, self.freq_bands))
+        samples = frames.astype(np.float64)
+        rms = np.sqrt(np.einsum('ij,ij->i', samples, samples) / length)
+
+        window = len(self.volume_history)
+        history = np.concatenate((np.roll(self.volume_history, -self._volume_index), rms))
+        volumes = sliding_window_view(history, window)[1:].mean(axis=1)
+        self.volume_history[:] = history[-window:]
+        self._volume_index = 0
+        self.volume = volumes[-1]
+        if self.calibration is not None and self.calibration.add(volumes):
+            self.apply_calibration(*self.calibration.estimate())
+
+        # Dynamic range only moves on chunks above the noise floor; carry it forward otherwise.
+        loud = np.where(volumes > self.noise_floor, np.arange(count), -1)
+        np.maximum.accumulate(loud, out=loud)
+        ranges = np.clip(volumes / self.max_volume, 0.5, 2.0)
+        ranges = np.where(loud >= 0, ranges[np.maximum(loud, 0)], self.dynamic_range)
+        self.dynamic_range = ranges[-1]
+
+        if length >= self.fft_size:
+            bands = self.engine.band_magnitudes_batch(samples)
+            peak = bands.max(axis=1, keepdims=True)
+            np.divide(bands, peak, out=bands, where=peak > 0)
+            np.multiply(bands, ranges[:, None], out=bands)
+            depth = self.band_history.shape[1]
+            history = np.concatenate((np.roll(self.band_history, -self._band_index, axis=1).T, bands))
+            freq_data = sliding_window_view(history, depth, axis=0)[1:].mean(axis=2)
+            self.band_history[:] = history[-depth:].T
+            self._band_index = 0
+            self.freq_data[:] = freq_data[-1]
+        else:
+            freq_data = np.repeat(self.freq_data[None, :], count, axis=0)
+        self.onsets.process(samples.ravel())
+        self._publish()
+        return volumes, freq_data
+
+    def _publish(self):
+        back = self._snapshots[(self._sequence + 1) & 1]
+        back.volume = self.volume
+        back.dynamic_range = self.dynamic_range
+        back.freq_data[:] = self.freq_data
+        back.stream_time = self.onsets.stream_time
+        back.beat_period = self.onsets.beat_period
+        back.beat_anchor = self.onsets.beat_anchor
+        self._sequence += 1
+
+    def snapshot(self):
+        """Return a consistent (volume, dynamic_range, freq_data) triple."""
+        while True:
+            sequence = self._sequence
+            front = self._snapshots[sequence & 1]
+            volume = front.volume
+            dynamic_range = front.dynamic_range
+            freq_data = front.freq_data.copy()
+            # The writer only touches this buffer after publishing the other one.
+            if self._sequence == sequence:
+                return volume, dynamic_range, freq_data
+
+    def _beat_state(self):
+        while True:
+            sequence = self._sequence
+            front = self._snapshots[sequence & 1]
+            state = (front.stream_time, front.beat_period, front.beat_anchor)
+            if self._sequence == sequence:
+                return state
 
     def calibrate(self, duration=3, stream=None):
         """Calibrate with tighter noise floor."""
@@ -67,11 +197,52 @@ class AudioAnalysis:
                 self.process_audio(audio_data)
             volumes.append(self.volume)
             time.sleep(0.1)
+        self.calibrate_from_volumes(volumes)
+
+    def start_calibration(self, duration=3, profile=None, half_life=300):
+        """Calibrate from the audio as it is analysed instead of blocking like calibrate().
+
+        A saved `profile` (see calibration.CalibrationProfiles) is used
+        straight away and refined from; without one the defaults stay until
+        `duration` seconds have been heard. The estimate is then refined
+        twice a second, older audio fading with a `half_life` in seconds.
+        """
+        calibration = VolumeCalibration(self.rows, self.chunk / self.rate, duration, half_life=half_life)
+        if profile is not None:
+            self.apply_calibration(profile['max_volume'], profile['noise_floor'])
+            calibration.load_profile(profile)
+        self.calibration = calibration
+
+    def apply_calibration(self, max_volume, noise_floor):
+        """Use MAX_VOLUME and NOISE_FLOOR (one entry per row) unless the maximum is not above the floor."""
+        max_volume = float(np.ravel(max_volume)[0])
+        noise_floor = float(np.ravel(noise_floor)[0])
+        if max_volume > noise_floor:
+            self.max_volume = max_volume
+            self.noise_floor = noise_floor
 
-        if volumes:
-            volumes.sort()
-            self.max_volume = volumes[int(len(volumes) * 0.9)] * 1.5  # Increased range
-            self.noise_floor = volumes[int(len(volumes) * 0.2)] * 1.3  # Higher threshold
+    def calibration_values(self):
+        """Current (max_volume, noise_floor), one entry per row."""
+        return np.array([self.max_volume]), np.array([self.noise_floor])
+
+    def calibration_stats(self):
+        """Progress of start_calibration(), or None if it was not called."""
+        calibration = self.calibration
+        if calibration is None:
+            return None
+        max_volume, noise_floor = self.calibration_values()
+        return {'ready': calibration.ready, 'seconds': calibration.seconds, 'duration': calibration.duration,
+                'from_profile': calibration.from_profile, 'max_volume': max_volume, 'noise_floor': noise_floor,
+                'histogram': calibration.quantiles.histogram()}
+
+    def calibrate_from_volumes(self, volumes):
+        """Set max_volume and noise_floor from a sequence of smoothed volumes."""
+        volumes = sorted(volumes)
+        max_volume = volumes[int(len(volumes) * 0.9)] * 1.5 if volumes else 0  # Increased range
+        noise_floor = volumes[int(len(volumes) * 0.2)] * 1.3 if volumes else 0  # Higher threshold
+        if max_volume > noise_floor:
+            self.max_volume = max_volume
+            self.noise_floor = noise_floor
             print(f"Calibration complete: max_volume={self.max_volume:.2f}, noise_floor={self.noise_floor:.2f}")
         else:
             self.max_volume = 5000
@@ -80,11 +251,257 @@ class AudioAnalysis:
 
     def get_volume(self):
         """Return tighter normalized volume."""
-        if self.volume < self.noise_floor * 1.2:  # Stricter noise gate
-            return 0
-        normalized = (self.volume - self.noise_floor) / (self.max_volume - self.noise_floor)
-        return max(0, min(1, normalized * self.dynamic_range))
+        volume, dynamic_range, _ = self.snapshot()
+        return normalized_volume(volume, dynamic_range, self.noise_floor, self.max_volume)
 
     def get_frequency_data(self):
         """Return enhanced frequency data."""
-        return self.freq_data
\ No newline at end of file
+        return self.snapshot()[2]
+
+    def get_onsets(self):
+        """Return the Onset events detected since the last call, oldest first."""
+        return self.onsets.drain()
+
+    def get_beat_phase(self):
+        """Position within the current beat in [0, 1), None while no tempo has been found."""
+        return beat_phase(*self._beat_state())
+
+    def onset_stats(self):
+        return self.onsets.stats()
+
+    def get_tempo(self):
+        """Running tempo estimate in BPM, 0 while unknown."""
+        period = self._beat_state()[1]
+        return 60.0 / period if period else 0.0
+
+
+class MultiChannelAnalysis(AudioAnalysis):
+    """AudioAnalysis of several channels at once, plus their mix.
+
+    Chunks arrive interleaved (frames, channels) from a multi-channel device
+    or file, or planar (channels, frames) from a MultiSource. Interleaved
+    input is de-interleaved by a transposed view; the only copy is the
+    int16-to-float conversion into one (rows, chunk) buffer whose last row
+    is the mix. Volume, dynamic range, the windowed rfft and the band
+    reduction then run once over that 2-D array, so another channel adds a
+    row to the same calls instead of another analyser. Onsets and tempo
+    follow the mix.
+
+    The getters inherited from AudioAnalysis report the mix; pass `channel`
+    or use get_channel_volumes/get_channel_frequency_data for single zones.
+    """
+
+    def __init__(self, channels, chunk=1024, rate=44100, hop_size=256):
+        super().__init__(chunk, rate, hop_size)
+        self.channels = channels
+        # A single channel is its own mix.
+        self.rows = channels + 1 if channels > 1 else 1
+        self.mix = self.rows - 1
+        self.max_volumes = np.full(self.rows, float(self.max_volume))
+        self.noise_floors = np.full(self.rows, float(self.noise_floor))
+        self.volume_history = np.zeros((self.rows, len(self.volume_history)))
+        self.band_history = np.zeros((self.rows,) + self.band_history.shape)
+        self._samples = np.zeros((self.rows, self.chunk))
+        self._windowed = np.empty((self.rows, self.fft_size))
+        self._bands = np.zeros((self.rows, self.freq_bands))
+        self._rms = np.zeros(self.rows)
+        self.volume = np.zeros(self.rows)
+        self.dynamic_range = np.ones(self.rows)
+        self.freq_data = np.zeros((self.rows, self.freq_bands))
+        self._snapshots = [self._snapshot_buffer(), self._snapshot_buffer()]
+
+    def _snapshot_buffer(self):
+        snapshot = AnalysisSnapshot(self.freq_bands)
+        snapshot.volume = np.zeros(self.rows)
+        snapshot.dynamic_range = np.ones(self.rows)
+        snapshot.freq_data = np.zeros((self.rows, self.freq_bands))
+        return snapshot
+
+    def deinterleave(self, in_data):
+        """(channels, frames) int16 view of a chunk, without copying."""
+        if isinstance(in_data, np.ndarray) and in_data.ndim == 2:
+            return in_data
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        frames = len(samples) // self.channels
+        return samples[:frames * self.channels].reshape(frames, self.channels).T
+
+    def process_audio(self, in_data, captured_at=None):
+        """Analyse one multi-channel chunk; see AudioAnalysis.process_audio."""
+        started = time.perf_counter()
+        try:
+            planar = self.deinterleave(in_data)
+            n = planar.shape[1]
+            if n == 0:
+                return
+            samples = self._samples[:, :n] if n <= self.chunk else np.empty((self.rows, n))
+            np.copyto(samples[:self.channels], planar)
+            if self.rows > self.channels:
+                mix = samples[self.mix]
+                np.add.reduce(samples[:self.channels], axis=0, out=mix)
+                np.multiply(mix, 1.0 / self.channels, out=mix)
+            np.einsum('ij,ij->i', samples, samples, out=self._rms)
+            np.sqrt(self._rms / n, out=self._rms)
+            self.volume_history[:, self._volume_index] = self._rms
+            self._volume_index = (self._volume_index + 1) % self.volume_history.shape[1]
+            # A fresh array each time, so calibrate() can keep the ones it collects.
+            self.volume = np.add.reduce(self.volume_history, axis=1) / self.volume_history.shape[1]
+            if self.calibration is not None and self.calibration.add(self.volume):
+                self.apply_calibration(*self.calibration.estimate())
+
+            loud = self.volume > self.noise_floors
+            np.copyto(self.dynamic_range, np.clip(self.volume / self.max_volumes, 0.5, 2.0), where=loud)
+
+            if n >= self.fft_size:
+                bands = self.engine.band_magnitudes_batch(samples, out=self._bands, windowed=self._windowed)
+                peak = bands.max(axis=1, keepdims=True)
+                np.divide(bands, peak, out=bands, where=peak > 0)
+                np.multiply(bands, self.dynamic_range[:, None], out=bands)
+                depth = self.band_history.shape[2]
+                self.band_history[:, :, self._band_index] = bands
+                self._band_index = (self._band_index + 1) % depth
+                np.add.reduce(self.band_history, axis=2, out=self.freq_data)
+                np.divide(self.freq_data, depth, out=self.freq_data)
+            self.onsets.process(samples[self.mix], started if captured_at is None else captured_at)
+            self._publish()
+        except Exception as e:
+            logging.error(f"Audio processing error: {e}")
+        finally:
+            if self.profiler:
+                self.profiler.record('process_audio', time.perf_counter() - started)
+
+    def process_batch(self, frames):
+        """Process many multi-channel chunks in one call; see AudioAnalysis.process_batch.
+
+        `frames` is raw interleaved int16 bytes or a planar (n_chunks,
+        channels, chunk) array. Returns (n_chunks, rows) smoothed volumes and
+        (n_chunks, rows, freq_bands) frequency data, mix last.
+        """
+        if isinstance(frames, (bytes, bytearray, memoryview)):
+            interleaved = np.frombuffer(frames, dtype=np.int16)
+            planar = interleaved.reshape(-1, self.chunk, self.channels).transpose(0, 2, 1)
+        else:
+            planar = np.asarray(frames)
+            planar = planar.reshape(-1, self.channels, planar.shape[-1])
+        count, _, length = planar.shape
+        if count == 0 or length == 0:
+            return np.zeros((0, self.rows)), np.zeros((0, self.rows, self.freq_bands))
+        samples = np.empty((count, self.rows, length))
+        np.copyto(samples[:, :self.channels], planar)
+        if self.rows > self.channels:
+            np.mean(samples[:, :self.channels], axis=1, out=samples[:, self.mix])
+        rms = np.sqrt(np.einsum('nij,nij->ni', samples, samples) / length)
+
+        window = self.volume_history.shape[1]
+        history = np.concatenate((np.roll(self.volume_history, -self._volume_index, axis=1).T, rms))
+        volumes = sliding_window_view(history, window, axis=0)[1:].mean(axis=2)
+        self.volume_history[:] = history[-window:].T
+        self._volume_index = 0
+        self.volume = volumes[-1].copy()
+        if self.calibration is not None and self.calibration.add(volumes):
+            self.apply_calibration(*self.calibration.estimate())
+
+        # Per row, dynamic range only moves on chunks above that row's noise floor.
+        loud = np.where(volumes > self.noise_floors, np.arange(count)[:, None], -1)
+        np.maximum.accumulate(loud, axis=0, out=loud)
+        ranges = np.clip(volumes / self.max_volumes, 0.5, 2.0)
+        ranges = np.where(loud >= 0, np.take_along_axis(ranges, np.maximum(loud, 0), axis=0), self.dynamic_range)
+        self.dynamic_range[:] = ranges[-1]
+
+        if length >= self.fft_size:
+            bands = self.engine.band_magnitudes_batch(samples.reshape(-1, length))
+            bands = bands.reshape(count, self.rows, self.freq_bands)
+            peak = bands.max(axis=2, keepdims=True)
+            np.divide(bands, peak, out=bands, where=peak > 0)
+            np.multiply(bands, ranges[:, :, None], out=bands)
+            depth = self.band_history.shape[2]
+            history = np.concatenate((np.roll(self.band_history, -self._band_index, axis=2).transpose(2, 0, 1), bands))
+            freq_data = sliding_window_view(history, depth, axis=0)[1:].mean(axis=3)
+            self.band_history[:] = history[-depth:].transpose(1, 2, 0)
+            self._band_index = 0
+            self.freq_data[:] = freq_data[-1]
+        else:
+            freq_data = np.repeat(self.freq_data[None], count, axis=0)
+        self.onsets.process(samples[:, self.mix].ravel())
+        self._publish()
+        return volumes, freq_data
+
+    def _publish(self):
+        back = self._snapshots[(self._sequence + 1) & 1]
+        back.volume[:] = self.volume
+        back.dynamic_range[:] = self.dynamic_range
+        back.freq_data[:] = self.freq_data
+        back.stream_time = self.onsets.stream_time
+        back.beat_period = self.onsets.beat_period
+        back.beat_anchor = self.onsets.beat_anchor
+        self._sequence += 1
+
+    def snapshot(self, channel=None):
+        """Consistent (volume, dynamic_range, freq_data) of CHANNEL, or of the mix.
+
+        With channel='all' the values are arrays with one row per channel
+        followed by the mix.
+        """
+        while True:
+            sequence = self._sequence
+            front = self._snapshots[sequence & 1]
+            volume = front.volume.copy()
+            dynamic_range = front.dynamic_range.copy()
+            freq_data = front.freq_data.copy()
+            if self._sequence == sequence:
+                break
+        if channel == 'all':
+            return volume, dynamic_range, freq_data
+        row = self.mix if channel is None else channel
+        return volume[row], dynamic_range[row], freq_data[row]
+
+    def calibrate_from_volumes(self, volumes):
+        """Set per-channel max_volumes and noise_floors from smoothed volume rows."""
+        volumes = np.sort(np.asarray(volumes, dtype=float).reshape(-1, self.rows), axis=0)
+        count = len(volumes)
+        max_volume = volumes[int(count * 0.9)] * 1.5 if count else np.zeros(self.rows)
+        noise_floor = volumes[int(count * 0.2)] * 1.3 if count else np.zeros(self.rows)
+        calibrated = max_volume > noise_floor
+        self.max_volumes = np.where(calibrated, max_volume, 5000.0)
+        self.noise_floors = np.where(calibrated, noise_floor, 500.0)
+        self.max_volume = float(self.max_volumes[self.mix])
+        self.noise_floor = float(self.noise_floors[self.mix])
+        for row in range(self.rows):
+            name = "mix" if row == self.mix and self.rows > 1 else f"channel {row}"
+            if calibrated[row]:
+                print(f"Calibration complete ({name}): max_volume={self.max_volumes[row]:.2f}, "
+                      f"noise_floor={self.noise_floors[row]:.2f}")
+            else:
+                print(f"Calibration failed ({name}), using default values")
+
+    def apply_calibration(self, max_volume, noise_floor):
+        """Per-row version of AudioAnalysis.apply_calibration; unusable rows keep their values."""
+        max_volume = np.asarray(max_volume, dtype=np.float64)
+        noise_floor = np.asarray(noise_floor, dtype=np.float64)
+        usable = max_volume > noise_floor
+        self.max_volumes = np.where(usable, max_volume, self.max_volumes)
+        self.noise_floors = np.where(usable, noise_floor, self.noise_floors)
+        self.max_volume = float(self.max_volumes[self.mix])
+        self.noise_floor = float(self.noise_floors[self.mix])
+
+    def calibration_values(self):
+        return self.max_volumes.copy(), self.noise_floors.copy()
+
+    def get_volume(self, channel=None):
+        """Normalized volume of CHANNEL, or of the mix."""
+        volume, dynamic_range, _ = self.snapshot(channel)
+        row = self.mix if channel is None else channel
+        return normalized_volume(volume, dynamic_range, self.noise_floors[row], self.max_volumes[row])
+
+    def get_frequency_data(self, channel=None):
+        """Band data of CHANNEL, or of the mix."""
+        return self.snapshot(channel)[2]
+
+    def get_channel_volumes(self):
+        """Normalized volume of every input channel, in channel order."""
+        volume, dynamic_range, _ = self.snapshot('all')
+        return [normalized_volume(volume[row], dynamic_range[row], self.noise_floors[row], self.max_volumes[row])
+                for row in range(self.channels)]
+
+    def get_channel_frequency_data(self):
+        """(channels, freq_bands) band data of every input channel."""
+        return self.snapshot('all')[2][:self.channels]
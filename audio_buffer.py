@@ -0,0 +1,107 @@
+import numpy as np
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+class ChunkRingBuffer:
+    """Preallocated single-producer/single-consumer ring of int16 audio chunks.
+
+    The producer only advances `write_count` and the consumer only advances
+    `read_count`, so no lock is needed as long as each side stays on its own
+    thread. When the consumer falls a full ring behind, new chunks are dropped.
+    """
+
+    def __init__(self, chunk, slots=32):
+        self.chunk = chunk
+        self.slots = slots
+        self.frames = np.zeros((slots, chunk), dtype=np.int16)
+        self.lengths = np.zeros(slots, dtype=np.int64)
+        self.timestamps = np.zeros(slots)
+        self.write_count = 0
+        self.read_count = 0
+        self.dropped = 0
+
+    def push(self, in_data, timestamp):
+        """Copy raw int16 bytes into the next free slot. Producer side only."""
+        if self.write_count - self.read_count >= self.slots:
+            self.dropped += 1
+            return False
+        slot = self.write_count % self.slots
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        n = min(len(samples), self.frames.shape[1])
+        self.frames[slot, :n] = samples[:n]
+        self.lengths[slot] = n
+        self.timestamps[slot] = timestamp
+        self.write_count += 1
+        return True
+
+    def peek(self):
+        """Return (samples view, capture timestamp) of the oldest chunk, or None."""
+        if self.read_count == self.write_count:
+            return None
+        slot = self.read_count % self.slots
+        return self.frames[slot, :self.lengths[slot]], self.timestamps[slot]
+
+    def release(self):
+        """Hand the slot returned by peek() back to the producer."""
+        self.read_count += 1
+
+    def pending(self):
+        return self.write_count - self.read_count
+
+
+class AnalysisWorker(threading.Thread):
+    """Drains a ChunkRingBuffer into processor.process_audio off the audio thread."""
+
+    def __init__(self, ring, processor, idle_timeout=0.05):
+        super().__init__(name="AnalysisWorker", daemon=True)
+        self.ring = ring
+        self.processor = processor
+        self.idle_timeout = idle_timeout
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self.processed = 0
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+
+    def notify(self):
+        self._wake.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.idle_timeout)
+            self._wake.clear()
+            self.drain()
+
+    def drain(self):
+        while True:
+            item = self.ring.peek()
+            if item is None:
+                return
+            samples, captured_at = item
+            self.processor.process_audio(samples, captured_at)
+            self.ring.release()
+            latency = time.perf_counter() - captured_at
+            self.processed += 1
+            self.last_latency = latency
+            self.avg_latency += (latency - self.avg_latency) * 0.05
+            self.max_latency = max(self.max_latency, latency)
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        return {
+            'processed': self.processed,
+            'dropped': self.ring.dropped,
+            'pending': self.ring.pending(),
+            'latency_ms': self.last_latency * 1000,
+            'avg_latency_ms': self.avg_latency * 1000,
+            'max_latency_ms': self.max_latency * 1000,
+        }
@@ -1,18 +1,33 @@
 import pyaudio
+import time
 import logging
+from audio_buffer import ChunkRingBuffer, AnalysisWorker
+from audio_sources import AudioSource
 
 logging.basicConfig(level=logging.INFO)
 
-class AudioCapture:
-    def __init__(self, rate=44100, chunk=1024, processor=None):
-        self.rate = rate
-        self.chunk = chunk
+class AudioCapture(AudioSource):
+    name = "mic"
+
+    def __init__(self, rate=44100, chunk=1024, processor=None, channels=1):
+        super().__init__(rate, chunk, processor)
+        self.channels = channels
         self.p = pyaudio.PyAudio()
-        self.processor = processor
+        try:
+            self.device_name = self.p.get_default_input_device_info()['name']
+        except OSError:
+            self.device_name = None
+        self.overflows = 0
+        self.ring = None
+        self.worker = None
+        if processor:
+            self.ring = ChunkRingBuffer(self.chunk * channels)
+            self.worker = AnalysisWorker(self.ring, processor)
+            self.worker.start()
         try:
             self.stream = self.p.open(
                 format=pyaudio.paInt16,
-                channels=1,
+                channels=channels,
                 rate=self.rate,
                 input=True,
                 frames_per_buffer=self.chunk,
@@ -23,13 +38,27 @@ class AudioCapture:
                 self.stream.start_stream()
         except OSError as e:
             logging.error(f"Error opening audio stream: {e}")
+            if self.worker:
+                self.worker.stop()
             raise
 
     def _audio_callback(self, in_data, frame_count, time_info, status):
-        if self.processor:
-            self.processor.process_audio(in_data)
+        # Runs on the PortAudio thread: only copy the frames and wake the worker.
+        if status & pyaudio.paInputOverflow:
+            self.overflows += 1
+        self.ring.push(in_data, time.perf_counter())
+        self.worker.notify()
         return (in_data, pyaudio.paContinue)
 
+    @property
+    def device(self):
+        return f"mic:{self.device_name}" if self.device_name else self.name
+
+    def stats(self):
+        stats = self.worker.stats() if self.worker else {}
+        stats['overflows'] = self.overflows
+        return stats
+
     def read_chunk(self):
         try:
             return self.stream.read(self.chunk, exception_on_overflow=False)
@@ -45,5 +74,7 @@ class AudioCapture:
         except OSError as e:
             logging.error(f"Error closing audio stream: {e}")
         finally:
+            if self.worker:
+                self.worker.stop()
             self.p.terminate()
             logging.info("PyAudio terminated.")
\ No newline at end of file
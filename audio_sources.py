@@ -0,0 +1,341 @@
+import numpy as np
+import struct
+import sys
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+class AudioSource:
+    """Base class for anything that produces int16 chunks for processor.process_audio.
+
+    Chunks hold `chunk` frames of `channels` interleaved samples; most
+    sources are mono.
+    """
+
+    name = "audio"
+    channels = 1
+
+    def __init__(self, rate=44100, chunk=1024, processor=None):
+        self.rate = rate
+        self.chunk = chunk
+        self.processor = processor
+
+    def read_chunk(self):
+        """Return the next chunk as raw int16 bytes, or b'' when the source is exhausted."""
+        raise NotImplementedError
+
+    @property
+    def device(self):
+        """Key for state kept per input device, such as its saved calibration; None unless this is one."""
+        return None
+
+    def stats(self):
+        return {'overflows': 0}
+
+    def poll(self):
+        """Housekeeping called once per frame from the UI thread."""
+
+    def close(self):
+        pass
+
+
+class ThreadedSource(AudioSource):
+    """Source that pushes its own chunks into the processor from a feeder thread.
+
+    With `realtime` the feeder is paced to the sample rate; otherwise it runs
+    as fast as the processor keeps up. Without a processor the source is
+    pull-only and callers use read_chunk() directly.
+    """
+
+    def __init__(self, rate=44100, chunk=1024, processor=None, realtime=True):
+        super().__init__(rate, chunk, processor)
+        self.realtime = realtime
+        self.chunks_fed = 0
+        self.finished = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.processor and self._thread is None:
+            self._thread = threading.Thread(target=self._feed, name=f"{type(self).__name__}Feeder", daemon=True)
+            self._thread.start()
+        return self
+
+    def _feed(self):
+        silence = bytes(self.chunk * 2 * self.channels)
+        started = time.perf_counter()
+        while not self._stop_event.is_set():
+            data = self.read_chunk()
+            if len(data) == 0:
+                if not self.finished:
+                    self.finished = True
+                    logging.info(f"{self.name}: end of input.")
+                if not self.realtime:
+                    return
+                # Keep feeding silence so the visuals settle instead of freezing.
+                data = silence
+            self.processor.process_audio(data)
+            self.chunks_fed += 1
+            if self.realtime:
+                delay = started + self.chunks_fed * self.chunk / self.rate - time.perf_counter()
+                if delay > 0:
+                    self._stop_event.wait(delay)
+
+    def stats(self):
+        return {'overflows': 0, 'chunks': self.chunks_fed, 'finished': self.finished}
+
+    def close(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        logging.info(f"{self.name} closed.")
+
+
+def _read_wav_layout(path):
+    """Return (rate, channels, data_offset, data_bytes) of a 16-bit PCM WAV file."""
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"{path} is not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(size - 16 + (size & 1), 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path} has data before fmt chunk")
+                audio_format, channels, rate, _, _, bits = fmt
+                if audio_format not in (1, 0xFFFE) or bits != 16:
+                    raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+                return rate, channels, f.tell(), size
+            else:
+                f.seek(size + (size & 1), 1)
+
+
+class FileSource(ThreadedSource):
+    """Memory-mapped 16-bit WAV or headerless raw PCM file.
+
+    Multi-channel files are downmixed to mono unless `keep_channels` is set,
+    in which case chunks keep the file's interleaved layout.
+    """
+
+    def __init__(self, path, rate=44100, chunk=1024, processor=None, realtime=True,
+                 loop=False, raw=False, channels=1, keep_channels=False):
+        if raw:
+            offset = 0
+        else:
+            rate, channels, offset, _ = _read_wav_layout(path)
+        super().__init__(rate, chunk, processor, realtime)
+        self.name = f"file:{path}"
+        self.path = path
+        self.loop = loop
+        self.file_channels = channels
+        self.channels = channels if keep_channels else 1
+        data = np.memmap(path, dtype='<i2', mode='r', offset=offset)
+        frames = len(data) // channels
+        self.samples = data[:frames * channels].reshape(frames, channels)
+        self.position = 0
+        logging.info(f"Opened {path}: {frames} frames, {channels} ch, {rate} Hz.")
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.rate
+
+    def seek(self, seconds):
+        self.position = max(0, min(len(self.samples), int(seconds * self.rate)))
+
+    def read_chunk(self):
+        if self.position >= len(self.samples):
+            if not self.loop or len(self.samples) == 0:
+                return b''
+            self.position = 0
+        block = self.samples[self.position:self.position + self.chunk]
+        self.position += len(block)
+        if self.file_channels > 1 and self.channels == 1:
+            block = block.mean(axis=1).astype(np.int16)
+        return block.astype(np.int16, copy=False).tobytes()
+
+    def close(self):
+        super().close()
+        self.samples = None
+
+
+class PcmStreamSource(ThreadedSource):
+    """Raw int16 PCM, mono or interleaved, read from a binary stream such as stdin.
+
+    Like FileSource, multi-channel input is downmixed to mono unless
+    `keep_channels` is set.
+    """
+
+    def __init__(self, stream, rate=44100, chunk=1024, processor=None, realtime=False, channels=1,
+                 keep_channels=False):
+        super().__init__(rate, chunk, processor, realtime)
+        self.name = "pcm-stream"
+        self.stream = stream
+        self.stream_channels = channels
+        self.channels = channels if keep_channels else 1
+
+    def read_chunk(self):
+        frame = 2 * self.stream_channels
+        data = self.stream.read(self.chunk * frame)
+        data = data[:len(data) - len(data) % frame]
+        if self.stream_channels > 1 and self.channels == 1:
+            block = np.frombuffer(data, dtype='<i2').reshape(-1, self.stream_channels)
+            return block.mean(axis=1).astype(np.int16).tobytes()
+        return data
+
+
+class SyntheticSource(ThreadedSource):
+    """Deterministic generated test signals: tone, sweep, noise bursts and claps."""
+
+    KINDS = ('tone', 'sweep', 'noise', 'claps')
+
+    def __init__(self, kind='tone', rate=44100, chunk=1024, processor=None, realtime=True,
+                 seed=0, duration=None, amplitude=0.5, frequency=440.0, bpm=120):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown synthetic source '{kind}', expected one of {', '.join(self.KINDS)}")
+        super().__init__(rate, chunk, processor, realtime)
+        self.name = f"synth:{kind}"
+        self.kind = kind
+        self.seed = seed
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self.beat_samples = int(rate * 60 / bpm)
+        self.total_samples = int(duration * rate) if duration else None
+        self.position = 0
+
+    def read_chunk(self):
+        count = self.chunk
+        if self.total_samples is not None:
+            count = min(count, self.total_samples - self.position)
+            if count <= 0:
+                return b''
+        signal = self.generate(self.position, count)
+        self.position += count
+        return (np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes()
+
+    def generate(self, start, count):
+        """Samples [start, start + count) of the signal in the range -1..1."""
+        n = np.arange(start, start + count)
+        t = n / self.rate
+        if self.kind == 'tone':
+            return self.amplitude * np.sin(2 * np.pi * self.frequency * t)
+        if self.kind == 'sweep':
+            # Exponential 50 Hz -> 8 kHz sweep repeating every 10 seconds.
+            period, f0, f1 = 10.0, 50.0, 8000.0
+            k = np.log(f1 / f0) / period
+            phase = 2 * np.pi * f0 * (np.exp(k * (t % period)) - 1) / k
+            return self.amplitude * np.sin(phase)
+        # Noise and claps are seeded per beat so any position is reproducible.
+        beat = n // self.beat_samples
+        offset = n % self.beat_samples
+        out = np.zeros(count)
+        for b in np.unique(beat):
+            mask = beat == b
+            rng = np.random.default_rng([self.seed, int(b)])
+            noise = rng.uniform(-1, 1, self.beat_samples)[offset[mask]]
+            if self.kind == 'noise':
+                gate = offset[mask] < self.beat_samples // 4
+                out[mask] = noise * gate * self.amplitude
+            else:
+                envelope = np.exp(-offset[mask] / (0.015 * self.rate))
+                out[mask] = noise * envelope
+        return out
+
+
+class MultiSource(ThreadedSource):
+    """Several mono sources read in lockstep and handed on as one (channels, chunk) array.
+
+    Each source fills one row of a reused planar buffer, so the processor
+    sees them as channels of a single device. A source that runs out is
+    padded with silence until all of them have.
+    """
+
+    def __init__(self, sources, rate=44100, chunk=1024, processor=None, realtime=True):
+        super().__init__(rate, chunk, processor, realtime)
+        self.sources = sources
+        self.channels = len(sources)
+        self.name = "+".join(source.name for source in sources)
+        self.planar = np.zeros((self.channels, chunk), dtype=np.int16)
+
+    def read_chunk(self):
+        active = False
+        for row, source in zip(self.planar, self.sources):
+            samples = np.frombuffer(source.read_chunk(), dtype=np.int16)[:self.chunk]
+            row[:len(samples)] = samples
+            row[len(samples):] = 0
+            active = active or len(samples) > 0
+        return self.planar if active else b''
+
+    def stats(self):
+        stats = super().stats()
+        stats['overflows'] = sum(source.stats()['overflows'] for source in self.sources)
+        return stats
+
+    def close(self):
+        super().close()
+        for source in self.sources:
+            source.close()
+
+
+def source_rate(spec, rate=44100, raw_rate=None):
+    """Sample rate the source for SPEC will deliver, so its analysis can be built first."""
+    kind, _, arg = spec.partition(':')
+    if spec == 'mic' or kind == 'synth':
+        return rate
+    if kind == 'raw':
+        return raw_rate or rate
+    return _read_wav_layout(arg if kind == 'file' else spec)[0]
+
+def create_source(spec, rate=44100, chunk=1024, processor=None, realtime=True, loop=False,
+                  seed=0, raw_rate=None, raw_channels=1, channels=1):
+    """Build an audio source from a command-line spec.
+
+    mic                 PyAudio input (default device)
+    file:PATH / PATH    16-bit WAV file
+    raw:PATH            headerless mono/interleaved int16 PCM, '-' for stdin
+    synth:KIND          one of SyntheticSource.KINDS
+
+    With `channels` > 1 the input must have that many channels and they are
+    kept interleaved instead of being downmixed.
+    """
+    kind, _, arg = spec.partition(':')
+    if spec == 'mic':
+        from audio_capture import AudioCapture
+        return AudioCapture(rate=rate, chunk=chunk, processor=processor, channels=channels)
+    if kind == 'synth':
+        if channels > 1:
+            raise ValueError("Synthetic sources are mono; combine several of them instead")
+        return SyntheticSource(arg or 'tone', rate, chunk, processor, realtime, seed=seed).start()
+    if kind == 'raw' and arg == '-':
+        source = PcmStreamSource(sys.stdin.buffer, raw_rate or rate, chunk, processor, realtime,
+                                 channels=raw_channels, keep_channels=channels > 1)
+    elif kind == 'raw':
+        source = FileSource(arg, raw_rate or rate, chunk, processor, realtime, loop,
+                            raw=True, channels=raw_channels, keep_channels=channels > 1)
+    else:
+        source = FileSource(arg if kind == 'file' else spec, rate, chunk, processor, realtime, loop,
+                            keep_channels=channels > 1)
+    if channels > 1 and source.channels != channels:
+        raise ValueError(f"{spec} has {source.channels} channels, expected {channels}")
+    return source.start()
+
+
+def create_multi_source(specs, rate=44100, chunk=1024, processor=None, realtime=True, loop=False,
+                        seed=0, raw_rate=None, raw_channels=1):
+    """One mono channel per spec, combined by a MultiSource; every input must have the same rate."""
+    rates = {spec: source_rate(spec, rate, raw_rate) for spec in specs}
+    if len(set(rates.values())) > 1:
+        raise ValueError("Inputs have different sample rates: " + ", ".join(f"{spec} {r} Hz" for spec, r in rates.items()))
+    rate = rates[specs[0]]
+    sources = [create_source(spec, rate, chunk, None, realtime, loop, seed + i, raw_rate, raw_channels)
+               for i, spec in enumerate(specs)]
+    return MultiSource(sources, rate, chunk, processor, realtime).start()
@@ -0,0 +1,145 @@
+import pygame
+import math
+import random
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+PLANETS = [
+    {'name': 'Sun', 'radius': 30, 'color': (255, 204, 0), 'orbit': 0},
+    {'name': 'Mercury', 'radius': 5, 'color': (169, 169, 169), 'orbit': 50},
+    {'name': 'Venus', 'radius': 8, 'color': (255, 215, 0), 'orbit': 80},
+    {'name': 'Earth', 'radius': 10, 'color': (0, 191, 255), 'orbit': 110},
+    {'name': 'Mars', 'radius': 7, 'color': (255, 99, 71), 'orbit': 140},
+    {'name': 'Jupiter', 'radius': 20, 'color': (210, 180, 140), 'orbit': 200},
+    {'name': 'Saturn', 'radius': 18, 'color': (238, 232, 170), 'orbit': 260},
+    {'name': 'Uranus', 'radius': 14, 'color': (173, 216, 230), 'orbit': 310},
+    {'name': 'Neptune', 'radius': 13, 'color': (65, 105, 225), 'orbit': 350}
+]
+
+class CosmicBackground:
+    """Solar-system backdrop with the static parts pre-rendered once per resolution.
+
+    The fill and orbit rings live on one cached surface and the sun glow is a
+    cached sprite. Star brightness is computed for all stars at once and
+    quantized to `twinkle_levels` pre-rendered star sprites, so each frame only
+    blits the cached pieces and draws the moving planets.
+
+    `draw_dirty` updates a surface that already holds the previous frame,
+    restoring the static backdrop only under the stars, planets and glow.
+    """
+
+    def __init__(self, width, height, star_count=150, twinkle_levels=32, rng=random, scale=1.0):
+        self.rng = rng
+        self.star_total = star_count
+        self.star_count = star_count
+        self.twinkle_levels = twinkle_levels
+        self.planets = [dict(planet, x=0, y=0) for planet in PLANETS]
+        self.resize(width, height, scale)
+
+    def resize(self, width, height, scale=None):
+        """Regenerate for a WIDTHxHEIGHT output drawn at `scale` of that resolution."""
+        self.width = width
+        self.height = height
+        if scale is not None:
+            self.scale = scale
+        self.glow = self._render_glow()
+        self.star_sprites = {}
+        self.star_x = np.array([self.rng.randint(0, width) for _ in range(self.star_total)])
+        self.star_y = np.array([self.rng.randint(0, height) for _ in range(self.star_total)])
+        self.star_size = np.array([self.rng.uniform(0.5, 2) for _ in range(self.star_total)])
+        self.star_offset = self.star_x * 0.01 + self.star_y * 0.01
+        self.star_px = (self.star_x * self.scale).astype(int)
+        self.star_py = (self.star_y * self.scale).astype(int)
+        # Fixed per-star bounds covering the sprite at full brightness.
+        extent = (self.star_size * self.scale).astype(int) + 1
+        self.star_rects = [pygame.Rect(x - r, y - r, r * 2 + 1, r * 2 + 1) for x, y, r
+                           in zip(self.star_px.tolist(), self.star_py.tolist(), extent.tolist())]
+        self.planet_rects = []
+        self.planets[0]['x'] = width * 0.25
+        self.planets[0]['y'] = height * 0.5
+        self.static = self._render_static()
+
+    def set_star_count(self, count):
+        self.star_count = max(0, min(count, self.star_total))
+
+    def _render_static(self):
+        scale = self.scale
+        surface = pygame.Surface((max(1, int(self.width * scale)), max(1, int(self.height * scale))))
+        surface.fill((5, 5, 15))
+        sun_x, sun_y = self.planets[0]['x'] * scale, self.planets[0]['y'] * scale
+        for planet in self.planets[1:]:
+            orbit_radius = planet['orbit'] * scale
+            for angle in range(0, 360, 10):
+                x = sun_x + math.cos(math.radians(angle)) * orbit_radius
+                y = sun_y + math.sin(math.radians(angle)) * orbit_radius
+                pygame.draw.circle(surface, (50, 50, 60), (int(x), int(y)), 1)
+        return surface
+
+    def _render_glow(self):
+        size = max(1, round(40 * self.scale))
+        glow = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+        for r in range(size, 0, -1):
+            alpha = int(100 * (r / size))
+            pygame.draw.circle(glow, (*self.planets[0]['color'], alpha), (size, size), r)
+        return glow
+
+    def _star_sprite(self, level, radius):
+        key = (level, radius)
+        sprite = self.star_sprites.get(key)
+        if sprite is None:
+            brightness = level / (self.twinkle_levels - 1)
+            color = (int(200 * brightness), int(220 * brightness), int(255 * brightness))
+            sprite = pygame.Surface((radius * 2 + 3, radius * 2 + 3))
+            sprite.set_colorkey((0, 0, 0))
+            pygame.draw.circle(sprite, color, (radius + 1, radius + 1), radius)
+            self.star_sprites[key] = sprite
+        return sprite
+
+    def draw(self, surface, cosmic_phase):
+        """Composite the backdrop for `cosmic_phase` onto `surface`."""
+        surface.blit(self.static, (0, 0))
+        self._draw_dynamic(surface, cosmic_phase)
+
+    def draw_dirty(self, surface, cosmic_phase):
+        """Advance `surface`, last drawn by draw(), to `cosmic_phase`; return the changed rects.
+
+        Every star rect is restored so stars hidden by a lower star count or
+        uncovered by a moving planet are redrawn correctly.
+        """
+        half = self.glow.get_width() // 2
+        glow_rect = pygame.Rect(int(self.planets[0]['x'] * self.scale - half),
+                                int(self.planets[0]['y'] * self.scale - half), half * 2, half * 2)
+        rects = self.star_rects + self.planet_rects + [glow_rect]
+        static = self.static
+        surface.blits([(static, rect, rect) for rect in rects], doreturn=False)
+        self._draw_dynamic(surface, cosmic_phase)
+        return rects + self.planet_rects
+
+    def _draw_dynamic(self, surface, cosmic_phase):
+        n = self.star_count
+        if n:
+            brightness = (np.sin(cosmic_phase + self.star_offset[:n]) + 1) * 0.5
+            levels = np.rint(brightness * (self.twinkle_levels - 1)).astype(int)
+            radii = (self.star_size[:n] * self.scale * levels / (self.twinkle_levels - 1)).astype(int)
+            visible = np.flatnonzero((radii > 0) & (levels > 0))
+            xs = (self.star_px[visible] - radii[visible] - 1).tolist()
+            ys = (self.star_py[visible] - radii[visible] - 1).tolist()
+            sprite = self._star_sprite
+            surface.blits([(sprite(level, radius), (x, y)) for level, radius, x, y
+                           in zip(levels[visible].tolist(), radii[visible].tolist(), xs, ys)], doreturn=False)
+
+        scale = self.scale
+        sun_x, sun_y = self.planets[0]['x'], self.planets[0]['y']
+        planet_rects = []
+        for i, planet in enumerate(self.planets[1:], 1):
+            orbit_angle = cosmic_phase * (10 / (i + 1))
+            planet['x'] = sun_x + math.cos(orbit_angle) * planet['orbit']
+            planet['y'] = sun_y + math.sin(orbit_angle) * planet['orbit']
+            planet_rects.append(pygame.draw.circle(surface, planet['color'],
+                                                   (int(planet['x'] * scale), int(planet['y'] * scale)),
+                                                   max(1, round(planet['radius'] * scale))))
+        self.planet_rects = planet_rects
+        half = self.glow.get_width() // 2
+        surface.blit(self.glow, (int(sun_x * scale - half), int(sun_y * scale - half)))
@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import logging
+import subprocess
+import tempfile
+
+# Benchmarks never open a window or touch audio hardware.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from audio_analysis import AudioAnalysis, MultiChannelAnalysis
+from audio_sources import SyntheticSource
+from feature_log import FeaturePlayer
+from profiler import FrameProfiler
+from visualizer import Visualizer
+
+logging.basicConfig(level=logging.INFO)
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4k': (3840, 2160)}
+LOUDNESS = {'low': (0.05, 0.2), 'medium': (0.3, 0.6), 'extreme': (0.9, 1.0)}
+
+def scripted_sequence(loudness, frames, seed=0, bands=16):
+    """Deterministic (volumes, freq_data) arrays for a loudness profile."""
+    rng = np.random.default_rng(seed)
+    low, high = LOUDNESS[loudness]
+    t = np.arange(frames)
+    volumes = low + (high - low) * (0.5 + 0.5 * np.sin(t * 0.07)) * rng.uniform(0.8, 1.0, frames)
+    freq_data = rng.uniform(0, 1, (frames, bands)) * (0.5 + 0.5 * np.sin(t[:, None] * 0.05 + np.arange(bands)))
+    return np.clip(volumes, 0, 1), freq_data
+
+def timing_summary(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'max_ms': float(ms.max()),
+    }
+
+def bench_visualizer(resolution, loudness, frames=300, warmup=60, seed=0):
+    width, height = RESOLUTIONS[resolution]
+    profiler = FrameProfiler(capacity=frames)
+    visualizer = Visualizer(width, height, profiler=profiler, rng=random.Random(seed))
+    target = pygame.Surface((width, height))
+    volumes, freq_data = scripted_sequence(loudness, warmup + frames, seed)
+    frame_times = []
+    for i in range(warmup + frames):
+        if i == warmup:
+            profiler.reset()
+        started = time.perf_counter()
+        visualizer.update(volumes[i], freq_data[i])
+        with profiler.stage('render'):
+            visualizer.render(target)
+        if i >= warmup:
+            frame_times.append(time.perf_counter() - started)
+    result = timing_summary(frame_times)
+    result['fps'] = 1000 / result['mean_ms']
+    result['particles'] = visualizer.particle_count
+    result['stages'] = {name: round(s['mean'], 4) for name, s in profiler.summary().items()}
+    return result
+
+def bench_process_audio(chunks=2000, chunk=1024, seed=0):
+    source = SyntheticSource('claps', chunk=chunk, seed=seed)
+    data = [source.read_chunk() for _ in range(chunks)]
+    analysis = AudioAnalysis(chunk)
+    for d in data[:50]:
+        analysis.process_audio(d)
+    samples = []
+    for d in data:
+        started = time.perf_counter()
+        analysis.process_audio(d)
+        samples.append(time.perf_counter() - started)
+    result = timing_summary(samples)
+    frames = np.frombuffer(b''.join(data), dtype=np.int16).reshape(-1, chunk)
+    started = time.perf_counter()
+    AudioAnalysis(chunk).process_batch(frames)
+    result['batch_mean_ms'] = (time.perf_counter() - started) * 1000 / chunks
+    return result
+
+def bench_multichannel(channel_counts=(1, 2, 4, 8), chunks=500, chunk=1024, seed=0):
+    """MultiChannelAnalysis per interleaved chunk against one AudioAnalysis per channel."""
+    results = {}
+    for channels in channel_counts:
+        sources = [SyntheticSource('claps', chunk=chunk, seed=seed + i) for i in range(channels)]
+        planar = [np.stack([np.frombuffer(source.read_chunk(), dtype=np.int16) for source in sources])
+                  for _ in range(chunks)]
+        interleaved = [np.ascontiguousarray(block.T).tobytes() for block in planar]
+        mono = [[row.tobytes() for row in block] for block in planar]
+        analysis = MultiChannelAnalysis(channels, chunk)
+        samples = []
+        for data in interleaved:
+            started = time.perf_counter()
+            analysis.process_audio(data)
+            samples.append(time.perf_counter() - started)
+        result = timing_summary(samples)
+        separate = [AudioAnalysis(chunk) for _ in range(channels)]
+        samples = []
+        for block in mono:
+            started = time.perf_counter()
+            for single, data in zip(separate, block):
+                single.process_audio(data)
+            samples.append(time.perf_counter() - started)
+        result['separate_mean_ms'] = timing_summary(samples)['mean_ms']
+        results[f"{channels}ch"] = result
+    return results
+
+def bench_startup(runs=3, source='synth:tone'):
+    """Time-to-first-frame of main.py in a fresh headless process."""
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy')
+    with tempfile.TemporaryDirectory() as directory:
+        cache = os.path.join(directory, 'calibration.json')
+        profile_out = os.path.join(directory, 'profile.json')
+        command = [sys.executable, main_py, '--source', source, '--exit-after', '1',
+                   '--calibration-cache', cache, '--profile-out', profile_out]
+        first_frame = []
+        process = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            process.append(time.perf_counter() - started)
+            with open(profile_out) as f:
+                first_frame.append(json.load(f)['stages']['first_frame']['mean'] / 1000)
+    result = timing_summary(first_frame)
+    result['process_mean_ms'] = timing_summary(process)['mean_ms']
+    return result
+
+def bench_bubble_surface(sizes=(10, 30, 50), repeats=200, seed=0):
+    visualizer = Visualizer(64, 64, rng=random.Random(seed))
+    results = {}
+    for size in sizes:
+        samples = []
+        for i in range(repeats):
+            started = time.perf_counter()
+            visualizer.create_bubble_surface(size, i * 7 % 360)
+            samples.append(time.perf_counter() - started)
+        results[f"size_{size}"] = timing_summary(samples)
+    samples = []
+    for i in range(repeats * 10):
+        started = time.perf_counter()
+        visualizer.sprite_cache.get(30, i * 7 % 360)
+        samples.append(time.perf_counter() - started)
+    results['cached_size_30'] = timing_summary(samples)
+    return results
+
+def bench_replay(resolution, path, warmup=60, seed=0):
+    """Time the visualizer on every frame of a --record file, in recorded order."""
+    width, height = RESOLUTIONS[resolution]
+    player = FeaturePlayer(path)
+    profiler = FrameProfiler(capacity=max(1, len(player)))
+    visualizer = Visualizer(width, height, profiler=profiler, rng=random.Random(seed))
+    target = pygame.Surface((width, height))
+    frame_times = []
+    for i in range(len(player)):
+        if i == warmup:
+            profiler.reset()
+        volume, freq_data, onsets, beat_phase = player.frame(i)
+        started = time.perf_counter()
+        visualizer.update(volume, freq_data, onsets, beat_phase)
+        with profiler.stage('render'):
+            visualizer.render(target)
+        if i >= warmup:
+            frame_times.append(time.perf_counter() - started)
+    player.close()
+    if not frame_times:
+        raise ValueError(f"{path} has no frames past the {warmup}-frame warmup")
+    result = timing_summary(frame_times)
+    result['fps'] = 1000 / result['mean_ms']
+    result['particles'] = visualizer.particle_count
+    result['stages'] = {name: round(s['mean'], 4) for name, s in profiler.summary().items()}
+    return result
+
+def run_suite(resolutions, loudness_levels, frames, warmup, seed, replays=()):
+    results = {}
+    for resolution in resolutions:
+        for path in replays:
+            name = f"replay/{resolution}/{os.path.basename(path)}"
+            logging.info(f"Running {name}")
+            results[name] = bench_replay(resolution, path, warmup, seed)
+    for resolution in resolutions:
+        for loudness in loudness_levels:
+            name = f"visualizer/{resolution}/{loudness}"
+            logging.info(f"Running {name}")
+            results[name] = bench_visualizer(resolution, loudness, frames, warmup, seed)
+    logging.info("Running process_audio")
+    results['process_audio'] = bench_process_audio(seed=seed)
+    logging.info("Running multichannel analysis")
+    for name, result in bench_multichannel(seed=seed).items():
+        results[f"multichannel/{name}"] = result
+    logging.info("Running startup")
+    results['startup'] = bench_startup()
+    logging.info("Running create_bubble_surface")
+    for name, result in bench_bubble_surface(seed=seed).items():
+        results[f"create_bubble_surface/{name}"] = result
+    return results
+
+def compare(results, baseline, threshold):
+    """Print mean-time ratios against BASELINE; return the names that regressed."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('mean_ms'):
+            continue
+        ratio = result['mean_ms'] / base['mean_ms']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<40} {base['mean_ms']:9.3f} -> {result['mean_ms']:9.3f} ms  x{ratio:5.2f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic headless Voice Art benchmarks")
+    parser.add_argument("--resolutions", default="720p,1080p,4k")
+    parser.add_argument("--loudness", default="low,medium,extreme")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", metavar="PATH", action="append", default=[],
+                        help="also time the visualizer on the frames of a main.py --record file")
+    parser.add_argument("--out", metavar="PATH", help="write JSON results to PATH instead of stdout")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression (default 0.10)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    pygame.init()
+    results = run_suite(args.resolutions.split(","), args.loudness.split(","),
+                        args.frames, args.warmup, args.seed, args.replay)
+    report = {
+        'meta': {
+            'seed': args.seed,
+            'frames': args.frames,
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    pygame.quit()
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
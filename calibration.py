@@ -0,0 +1,205 @@
+import numpy as np
+import json
+import math
+import os
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+def default_cache_path():
+    """calibration.json under $XDG_CACHE_HOME/voice_art, or ~/.cache/voice_art."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'voice_art', 'calibration.json')
+
+class StreamingQuantiles:
+    """Running quantiles of non-negative values, one set per row, in O(1) per sample.
+
+    Samples are counted in `bins` log-spaced bins covering `low`..`high`;
+    anything below `low` shares bin 0 and reads back as 0. Quantiles are
+    interpolated inside a bin, so they are within a few percent. With a
+    `half_life` (in samples) older samples fade out: rather than decaying
+    every count, each new sample weighs a little more than the last, and the
+    counts are rescaled once the weights grow large.
+    """
+
+    def __init__(self, rows=1, bins=256, low=1.0, high=65536.0, half_life=None):
+        self.rows = rows
+        self.bins = bins
+        self._log_low = math.log(low)
+        self._scale = (bins - 1) / (math.log(high) - self._log_low)
+        self.low = low
+        self.counts = np.zeros((rows, bins))
+        self.count = 0
+        self._growth = 2.0 ** (1.0 / half_life) if half_life else 1.0
+        self._weight = 1.0
+        self._rows = np.arange(rows)
+
+    def _bin(self, value):
+        if not value >= self.low:
+            return 0
+        return min(int((math.log(value) - self._log_low) * self._scale) + 1, self.bins - 1)
+
+    def _bins(self, values):
+        with np.errstate(divide='ignore'):
+            positions = np.floor((np.log(np.maximum(values, 0.0)) - self._log_low) * self._scale) + 1
+        return np.clip(positions, 0, self.bins - 1).astype(np.intp)
+
+    def add(self, values):
+        """Add one value per row, or an (n, rows) block of them."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == self.rows:
+            # One sample per analysed chunk: plain Python beats numpy's per-call overhead here.
+            self._weight *= self._growth
+            counts = self.counts
+            for row, value in enumerate(values.ravel().tolist()):
+                counts[row, self._bin(value)] += self._weight
+            n = 1
+        else:
+            bins = self._bins(values.reshape(-1, self.rows))
+            n = len(bins)
+        if n > 1:
+            weights = self._weight * self._growth ** np.arange(1, n + 1)
+            self._weight = weights[-1]
+            np.add.at(self.counts, (np.broadcast_to(self._rows, bins.shape), bins),
+                      np.broadcast_to(weights[:, None], bins.shape))
+        self.count += n
+        if self._weight > 1e100:
+            self.counts /= self._weight
+            self._weight = 1.0
+
+    def quantile(self, q):
+        """The Q quantile (0..1) of each row, 0 for rows without samples."""
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1]
+        target = q * total
+        index = np.minimum((cumulative < target[:, None]).sum(axis=1), self.bins - 1)
+        below = np.where(index > 0, cumulative[self._rows, index - 1], 0.0)
+        inside = self.counts[self._rows, index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(inside > 0, (target - below) / inside, 0.0)
+        values = np.exp(self._log_low + (index - 1 + fraction) / self._scale)
+        return np.where((index > 0) & (total > 0), values, 0.0)
+
+    def histogram(self):
+        """Counts scaled so the newest sample weighs 1, as load_histogram takes them."""
+        return self.counts / self._weight
+
+    def load_histogram(self, counts):
+        """Continue from a histogram() saved earlier; its samples count as older than any new one."""
+        counts = np.asarray(counts, dtype=np.float64)
+        if counts.shape != self.counts.shape:
+            raise ValueError(f"histogram has shape {counts.shape}, expected {self.counts.shape}")
+        self.counts = counts * self._weight
+        self.count = int(round(counts.sum() / self.rows))
+
+
+class VolumeCalibration:
+    """Noise floor and maximum volume refined from every analysed chunk.
+
+    They come from the same percentiles as AudioAnalysis.calibrate_from_volumes
+    (the 90th times 1.5 and the 20th times 1.3 of the smoothed volume), taken
+    from a StreamingQuantiles instead of a sorted list. The first estimate is
+    due once `duration` seconds have been heard, then every `refresh`
+    seconds; older audio fades with a `half_life` in seconds.
+    """
+
+    def __init__(self, rows=1, chunk_seconds=1024 / 44100, duration=3, refresh=0.5, half_life=300):
+        self.chunk_seconds = chunk_seconds
+        self.duration = duration
+        self.quantiles = StreamingQuantiles(rows, half_life=half_life / chunk_seconds)
+        self.warmup = max(1, int(round(duration / chunk_seconds)))
+        self.refresh = max(1, int(round(refresh / chunk_seconds)))
+        self._next = self.warmup
+        self.from_profile = False
+
+    @property
+    def seconds(self):
+        """Audio heard so far, including what a loaded profile had heard."""
+        return self.quantiles.count * self.chunk_seconds
+
+    @property
+    def ready(self):
+        return self.quantiles.count >= self.warmup
+
+    def load_profile(self, profile):
+        """Carry on from a saved profile's histogram, if it has a usable one."""
+        self.from_profile = True
+        histogram = profile.get('histogram')
+        if histogram is None:
+            return
+        try:
+            self.quantiles.load_histogram(histogram)
+        except ValueError as e:
+            logging.warning(f"Ignoring saved calibration histogram: {e}")
+            return
+        self._next = max(self.quantiles.count, self.warmup)
+
+    def add(self, volumes):
+        """Feed smoothed volumes (one per row, or (n, rows)); return True when a new estimate is due."""
+        self.quantiles.add(volumes)
+        if self.quantiles.count < self._next:
+            return False
+        self._next = self.quantiles.count + self.refresh
+        return True
+
+    def estimate(self):
+        """(max_volume, noise_floor), one entry per row."""
+        return self.quantiles.quantile(0.9) * 1.5, self.quantiles.quantile(0.2) * 1.3
+
+
+class CalibrationProfiles:
+    """Last known good calibration of each input device, kept in a small JSON file.
+
+    A profile holds max_volume and noise_floor per analysis row, how many
+    seconds of audio they were measured over, and the quantile histogram so
+    calibration carries on from it after a restart.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        self.profiles = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring calibration cache {self.path}: {e}")
+            return {}
+        return data.get('devices', {}) if isinstance(data, dict) else {}
+
+    def get(self, device, rows=1):
+        """The profile saved for DEVICE with ROWS analysis rows, or None."""
+        profile = self.profiles.get(device)
+        if not isinstance(profile, dict):
+            return None
+        try:
+            max_volume = np.asarray(profile['max_volume'], dtype=np.float64)
+            noise_floor = np.asarray(profile['noise_floor'], dtype=np.float64)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if max_volume.shape != (rows,) or noise_floor.shape != (rows,) or not (max_volume > noise_floor).all():
+            return None
+        return {'max_volume': max_volume, 'noise_floor': noise_floor,
+                'seconds': profile.get('seconds', 0.0), 'histogram': profile.get('histogram')}
+
+    def save(self, device, max_volume, noise_floor, seconds, histogram=None):
+        self.profiles[device] = {
+            'max_volume': np.atleast_1d(max_volume).tolist(),
+            'noise_floor': np.atleast_1d(noise_floor).tolist(),
+            'seconds': round(seconds, 1),
+            'saved': time.time(),
+            'histogram': None if histogram is None else np.round(histogram, 4).tolist(),
+        }
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(temporary, 'w') as f:
+                json.dump({'version': 1, 'devices': self.profiles}, f)
+            # Replace in one step, so a kiosk restarted mid-write keeps the previous file.
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save calibration to {self.path}: {e}")
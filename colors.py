@@ -0,0 +1,17 @@
+import numpy as np
+
+def hsv_to_rgb_array(h, s, v):
+    """Vectorized counterpart of Visualizer._hsv_to_rgb, returns an (n, 3) int array."""
+    h = np.asarray(h, dtype=np.float64) % 360 / 60.0
+    s = np.broadcast_to(np.asarray(s, dtype=np.float64), h.shape)
+    v = np.broadcast_to(np.asarray(v, dtype=np.float64), h.shape)
+    i = np.floor(h).astype(np.int64)
+    f = h - i
+    p = v * (1 - s)
+    q = v * (1 - s * f)
+    t = v * (1 - s * (1 - f))
+    sector = np.clip(i, 0, 5)
+    r = np.choose(sector, [v, q, p, p, t, v])
+    g = np.choose(sector, [t, v, v, q, p, p])
+    b = np.choose(sector, [p, p, t, v, v, q])
+    return (np.stack((r, g, b), axis=-1) * 255).astype(np.int64)
@@ -0,0 +1,241 @@
+import numpy as np
+import math
+import os
+import struct
+import time
+import logging
+from audio_sources import AudioSource
+from onsets import Onset
+
+logging.basicConfig(level=logging.INFO)
+
+MAGIC = b'VAFEAT01'
+# magic, freq_bands, record_size, created (unix time)
+_HEADER = struct.Struct('<8sIId')
+
+def record_dtype(freq_bands):
+    """Packed little-endian layout of one recorded frame."""
+    return np.dtype([
+        ('time', '<f8'),            # seconds since recording started
+        ('volume', '<f4'),          # get_volume()
+        ('beat_phase', '<f4'),      # NaN while no tempo was known
+        ('max_volume', '<f4'),      # calibration in effect for this frame
+        ('noise_floor', '<f4'),
+        ('onset_count', '<u2'),
+        ('onset_strength', '<f4'),  # strongest onset in the frame
+        ('freq_data', '<f4', (freq_bands,)),
+    ])
+
+def _phase(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+class FeatureRecorder:
+    """Appends one fixed-size record per frame of analysis output to PATH.
+
+    Records are staged in a preallocated block and written `block` at a time,
+    so recording a frame is a handful of array stores.
+    """
+
+    def __init__(self, path, freq_bands=16, block=256):
+        self.path = path
+        self.dtype = record_dtype(freq_bands)
+        self.freq_bands = freq_bands
+        self.file = open(path, 'wb')
+        self.file.write(_HEADER.pack(MAGIC, freq_bands, self.dtype.itemsize, time.time()))
+        self.buffer = np.zeros(block, dtype=self.dtype)
+        self.pending = 0
+        self.count = 0
+        self.started = None
+
+    def record(self, volume, freq_data, onsets=(), beat_phase=None, max_volume=0.0, noise_floor=0.0, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.started is None:
+            self.started = now
+        row = self.buffer[self.pending]
+        row['time'] = now - self.started
+        row['volume'] = volume
+        row['beat_phase'] = np.nan if beat_phase is None else beat_phase
+        row['max_volume'] = max_volume
+        row['noise_floor'] = noise_floor
+        row['onset_count'] = len(onsets)
+        row['onset_strength'] = max((onset.strength for onset in onsets), default=0.0)
+        row['freq_data'] = freq_data
+        self.pending += 1
+        self.count += 1
+        if self.pending == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(self.buffer[:self.pending].tobytes())
+            self.pending = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+        logging.info(f"Recorded {self.count} frames to {self.path}")
+
+
+class FeaturePlayer:
+    """Memory-mapped reader for a FeatureRecorder file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is too short for a feature recording")
+        magic, freq_bands, record_size, self.created = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a feature recording")
+        self.freq_bands = freq_bands
+        self.dtype = record_dtype(freq_bands)
+        if record_size != self.dtype.itemsize:
+            raise ValueError(f"{path} has {record_size}-byte records, expected {self.dtype.itemsize}")
+        count, extra = divmod(os.path.getsize(path) - _HEADER.size, record_size)
+        if extra:
+            raise ValueError(f"{path} ends {extra} bytes into record {count}; the recording is truncated")
+        if count == 0:
+            raise ValueError(f"{path} holds no frames")
+        self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=_HEADER.size)
+        self.times = self.records['time']
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        return float(self.times[-1]) if len(self.records) else 0.0
+
+    def index_at(self, seconds):
+        """Index of the last record at or before SECONDS."""
+        return max(0, int(np.searchsorted(self.times, seconds, side='right')) - 1)
+
+    def frame(self, index):
+        """(volume, freq_data, onsets, beat_phase) for record INDEX, as Visualizer.update takes them."""
+        row = self.records[index]
+        now = time.perf_counter()
+        onsets = [Onset(float(row['time']), float(row['onset_strength']), now, now)
+                  for _ in range(int(row['onset_count']))]
+        return float(row['volume']), row['freq_data'].astype(np.float64), onsets, _phase(row['beat_phase'])
+
+    def close(self):
+        # The mapping is released once the last view of it is gone.
+        self.records = self.times = None
+
+
+class FeatureReplay(AudioSource):
+    """Plays a recording back in place of capture and AudioAnalysis.
+
+    By default the position follows the wall clock times `speed`; with
+    `step` each poll() advances exactly one record, so a replay feeds the
+    visualizer the same inputs frame for frame, as fast as it renders.
+    Onsets in skipped records are still delivered.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, step=False, start=0.0):
+        self.player = FeaturePlayer(path)
+        super().__init__()
+        self.name = f"replay:{path}"
+        self.speed = speed
+        self.loop = loop
+        self.step = step
+        self.profiler = None
+        self.finished = False
+        self.frames_played = 0
+        self._onsets = []
+        self._last_poll = None
+        self.seek(start)
+
+    @property
+    def position(self):
+        return self._position
+
+    def seek(self, seconds):
+        """Jump to SECONDS into the recording."""
+        self._position = min(max(0.0, seconds), self.player.duration)
+        # The next poll() delivers the record at the new position, onsets included.
+        self.index = self.player.index_at(self._position) - 1
+        self._onsets = []
+        self.finished = False
+
+    def poll(self):
+        now = time.perf_counter()
+        elapsed = 0.0 if self._last_poll is None else now - self._last_poll
+        self._last_poll = now
+        count = len(self.player)
+        previous = self.index
+        if self.step:
+            index = previous + 1
+        else:
+            self._position += elapsed * self.speed
+            index = self.player.index_at(self._position)
+        if index >= count:
+            if self.loop:
+                self.seek(0.0)
+                index = 0
+                previous = -1
+            else:
+                index = count - 1
+                if not self.finished:
+                    self.finished = True
+                    logging.info(f"{self.name}: end of recording.")
+        if index > previous:
+            records = self.player.records
+            for i in range(previous + 1, index + 1):
+                if records[i]['onset_count']:
+                    self._onsets.extend(self.player.frame(i)[2])
+            self.frames_played += index - previous
+        self.index = index
+        if self.step:
+            self._position = float(self.player.times[index])
+
+    def _current(self):
+        return self.player.records[max(self.index, 0)]
+
+    def calibrate(self, duration=3):
+        """Recordings carry their calibration; nothing to listen for."""
+
+    def start_calibration(self, duration=3, profile=None):
+        """See calibrate()."""
+
+    def calibration_stats(self):
+        return None
+
+    @property
+    def max_volume(self):
+        return float(self._current()['max_volume'])
+
+    @property
+    def noise_floor(self):
+        return float(self._current()['noise_floor'])
+
+    def get_volume(self):
+        return float(self._current()['volume'])
+
+    def get_frequency_data(self):
+        return self._current()['freq_data'].astype(np.float64)
+
+    def get_onsets(self):
+        onsets, self._onsets = self._onsets, []
+        return onsets
+
+    def get_beat_phase(self):
+        return _phase(self._current()['beat_phase'])
+
+    def get_tempo(self):
+        return 0.0
+
+    def onset_stats(self):
+        return {'onsets': 0, 'tempo_bpm': 0.0, 'avg_latency_ms': 0.0, 'max_latency_ms': 0.0}
+
+    def stats(self):
+        return {'overflows': 0, 'frames': self.frames_played, 'position': self._position,
+                'duration': self.player.duration, 'speed': self.speed, 'finished': self.finished}
+
+    def close(self):
+        self.player.close()
@@ -0,0 +1,567 @@
+import os
+import sys
+import time
+import json
+import base64
+import struct
+import asyncio
+import hashlib
+import socket
+import argparse
+import urllib.parse
+import ipaddress
+import threading
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+
+MAGIC = b'VA'
+VERSION = 1
+# magic, version, band count, sequence, sent_at (unix time), volume, beat_phase, onset_count, padding.
+# 28 bytes, so the float32 bands that follow can be read with Float32Array(buffer, 28, bands).
+FRAME_HEADER = struct.Struct('<2sBBIdffH2x')
+_WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# Clients only send acknowledgements, pings and close frames.
+MAX_CLIENT_FRAME = 65536
+
+def encode_frame(sequence, volume, freq_data, beat_phase=0.0, onset_count=0, sent_at=None):
+    """One feature frame as bytes: FRAME_HEADER then little-endian float32 bands."""
+    bands = np.asarray(freq_data, dtype='<f4')
+    sent_at = time.time() if sent_at is None else sent_at
+    return FRAME_HEADER.pack(MAGIC, VERSION, len(bands), sequence & 0xFFFFFFFF, sent_at,
+                             volume, beat_phase, min(onset_count, 0xFFFF)) + bands.tobytes()
+
+def decode_frame(data):
+    magic, version, bands, sequence, sent_at, volume, beat_phase, onset_count = FRAME_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a feature frame")
+    return {
+        'sequence': sequence,
+        'sent_at': sent_at,
+        'volume': volume,
+        'beat_phase': beat_phase,
+        'onset_count': onset_count,
+        'freq_data': np.frombuffer(data, dtype='<f4', count=bands, offset=FRAME_HEADER.size),
+    }
+
+def websocket_frame(payload, opcode=0x2):
+    """An unmasked, unfragmented server-to-client WebSocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+class FrameTooLarge(ValueError):
+    pass
+
+async def read_websocket_frame(reader, max_length=None):
+    """(opcode, payload) of the next frame, unmasking client frames.
+
+    Raises FrameTooLarge, before reading the payload, for frames longer than MAX_LENGTH.
+    """
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack('!Q', await reader.readexactly(8))
+    if max_length is not None and length > max_length:
+        raise FrameTooLarge(f"{length}-byte WebSocket frame, limit {max_length}")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask and length:
+        key = np.frombuffer(mask * (length // 4 + 1), dtype=np.uint8, count=length)
+        payload = (np.frombuffer(payload, dtype=np.uint8) ^ key).tobytes()
+    return first & 0x0F, payload
+
+
+class _WebSocketClient:
+    """One connected WebSocket peer holding only the newest unsent frame.
+
+    With a `window`, at most that many frames are in flight: each message
+    the client sends back acknowledges one, and frames offered while the
+    window is full replace the pending one.
+    """
+
+    def __init__(self, writer, window=None):
+        self.writer = writer
+        self.peer = writer.get_extra_info('peername')
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.window = window
+        self.credits = window
+        self.credit = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def acknowledge(self):
+        if self.window:
+            self.credits = min(self.window, self.credits + 1)
+            self.credit.set()
+
+    def offer(self, frame):
+        if self.pending is not None:
+            # The previous frame never went out; the newer one replaces it.
+            self.dropped += 1
+        self.pending = frame
+        self.ready.set()
+
+    async def send_loop(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            if self.window:
+                while self.credits <= 0:
+                    self.credit.clear()
+                    await self.credit.wait()
+                self.credits -= 1
+            frame, self.pending = self.pending, None
+            self.writer.write(frame)
+            # Waits only while this client's socket buffer is full; other clients keep going.
+            await self.writer.drain()
+            self.sent += 1
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    """b'hello' subscribes its sender and b'bye' unsubscribes; anything else is ignored.
+
+    Only senders in the server's `udp_allow` networks are subscribed, so a
+    spoofed source address cannot point the stream at an arbitrary host.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        clients = self.server.udp_clients
+        if data == b'bye':
+            clients.pop(addr, None)
+        elif data != b'hello' or not self.server.udp_allowed(addr[0]):
+            return
+        elif addr in clients or len(clients) < self.server.udp_max_clients:
+            clients[addr] = time.monotonic()
+        else:
+            logging.debug(f"UDP client limit reached, ignoring {addr}")
+
+    def error_received(self, exc):
+        logging.debug(f"UDP error: {exc}")
+
+
+class FeatureServer:
+    """Broadcasts the latest analysis features to WebSocket and UDP clients.
+
+    The render loop calls publish() every frame; that only swaps a reference.
+    An asyncio loop on a background thread encodes the newest frame at most
+    `rate` times per second and fans the same bytes out to every client.
+    Each WebSocket client keeps just the newest unsent frame, so a slow
+    client drops frames instead of queueing them; its kernel send buffer is
+    shrunk to `send_buffer` bytes so little can pile up below that either.
+    Frames still waiting in the client's receive buffer are out of reach,
+    so a client that connects to `/?ack` and answers every frame with any
+    message gets at most `ack_window` frames in flight and always renders
+    a recent one, however slowly it reads.
+    UDP subscribers that stop sending keepalives are forgotten after
+    `udp_timeout` seconds. Only addresses in `udp_allow` (loopback by
+    default) may subscribe, and at most `udp_max_clients` at a time.
+    """
+
+    def __init__(self, host='127.0.0.1', ws_port=None, udp_port=None, rate=60, udp_timeout=10.0,
+                 send_buffer=4096, ack_window=2, udp_allow=('127.0.0.0/8', '::1'), udp_max_clients=64):
+        if ws_port is None and udp_port is None:
+            raise ValueError("FeatureServer needs a WebSocket port, a UDP port, or both")
+        self.host = host
+        self.ws_port = ws_port
+        self.udp_port = udp_port
+        self.rate = rate
+        self.udp_timeout = udp_timeout
+        self.send_buffer = send_buffer
+        self.ack_window = ack_window
+        self.udp_allow = [ipaddress.ip_network(network, strict=False) for network in udp_allow]
+        self.udp_max_clients = udp_max_clients
+        self.ws_clients = set()
+        self.udp_clients = {}
+        self.sequence = 0
+        self.frames = 0
+        self.bytes_sent = 0
+        self.dropped = 0  # by clients that have since disconnected
+        self.publish_ms = 0.0
+        self._latest = None
+        # Onsets published so far, written only by publish(); the server
+        # thread sends the difference from the total it last saw.
+        self._onset_total = 0
+        self._onsets_sent = 0
+        # ws_clients changes on the server thread while stats() reads it from the render loop.
+        self._clients_lock = threading.Lock()
+        self._loop = None
+        self._stop = None
+        self._udp = None
+        self._started = threading.Event()
+        self._error = None
+        self._thread = None
+
+    def start(self):
+        """Start serving on a background thread; ports of 0 are replaced by the bound ones."""
+        self._thread = threading.Thread(target=self._run, name="feature-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def udp_allowed(self, host):
+        try:
+            address = ipaddress.ip_address(host.split('%')[0])
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        return any(address in network for network in self.udp_allow)
+
+    def publish(self, volume, freq_data, onsets=(), beat_phase=None):
+        """Offer the current frame; cheap enough to call from the render loop.
+
+        Frames carry a beat phase of 0 while no tempo is known.
+        """
+        beat_phase = 0.0 if beat_phase is None else beat_phase
+        self._onset_total += len(onsets)
+        # Copied: analysis buffers are reused while the server thread encodes.
+        self._latest = (volume, np.array(freq_data, dtype='<f4'), beat_phase, self._onset_total)
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._error = e
+            self._started.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        servers = []
+        if self.ws_port is not None:
+            server = await asyncio.start_server(self._handle_websocket, self.host, self.ws_port)
+            self.ws_port = server.sockets[0].getsockname()[1]
+            servers.append(server)
+        if self.udp_port is not None:
+            transport, self._udp = await self._loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self), local_addr=(self.host, self.udp_port))
+            self.udp_port = transport.get_extra_info('sockname')[1]
+        logging.info(f"Feature server on {self.host}: WebSocket {self.ws_port}, UDP {self.udp_port}, {self.rate} fps")
+        self._started.set()
+        try:
+            await self._broadcast_loop()
+        finally:
+            for server in servers:
+                server.close()
+            for client in list(self.ws_clients):
+                client.writer.close()
+            if self._udp:
+                self._udp.transport.close()
+
+    async def _broadcast_loop(self):
+        interval = 1.0 / self.rate
+        deadline = time.perf_counter()
+        sent = None
+        expire_at = time.monotonic() + 1.0
+        while not self._stop.is_set():
+            latest = self._latest
+            if latest is not None and latest is not sent:
+                sent = latest
+                self._broadcast(*latest)
+            if time.monotonic() >= expire_at:
+                self._expire_udp_clients()
+                expire_at = time.monotonic() + 1.0
+            deadline += interval
+            delay = deadline - time.perf_counter()
+            if delay < 0:
+                # Fell behind; skip the missed ticks rather than bursting.
+                deadline = time.perf_counter()
+                delay = 0
+            try:
+                await asyncio.wait_for(self._stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _broadcast(self, volume, freq_data, beat_phase, onset_total):
+        started = time.perf_counter()
+        onsets, self._onsets_sent = onset_total - self._onsets_sent, onset_total
+        self.sequence += 1
+        payload = encode_frame(self.sequence, volume, freq_data, beat_phase, onsets)
+        if self.ws_clients:
+            frame = websocket_frame(payload)
+            for client in self.ws_clients:
+                client.offer(frame)
+            self.bytes_sent += len(frame) * len(self.ws_clients)
+        if self._udp and self.udp_clients:
+            sendto = self._udp.transport.sendto
+            for addr in self.udp_clients:
+                sendto(payload, addr)
+            self.bytes_sent += len(payload) * len(self.udp_clients)
+        self.frames += 1
+        self.publish_ms += ((time.perf_counter() - started) * 1000 - self.publish_ms) * 0.05
+
+    def _expire_udp_clients(self):
+        cutoff = time.monotonic() - self.udp_timeout
+        for addr in [addr for addr, seen in self.udp_clients.items() if seen < cutoff]:
+            del self.udp_clients[addr]
+
+    async def _handle_websocket(self, reader, writer):
+        try:
+            path = await self._handshake(reader, writer)
+            if path is None:
+                return
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        sock = writer.get_extra_info('socket')
+        if sock is not None and self.send_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        # drain() then waits until each frame has reached the kernel.
+        writer.transport.set_write_buffer_limits(high=0)
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query, keep_blank_values=True)
+        client = _WebSocketClient(writer, self.ack_window if 'ack' in query else None)
+        with self._clients_lock:
+            self.ws_clients.add(client)
+        sender = asyncio.create_task(client.send_loop())
+        try:
+            while True:
+                opcode, payload = await read_websocket_frame(reader, MAX_CLIENT_FRAME)
+                if opcode == 0x8:
+                    break
+                if opcode in (0x1, 0x2):
+                    client.acknowledge()
+                if opcode == 0x9:
+                    writer.write(websocket_frame(payload, opcode=0xA))
+        except FrameTooLarge as e:
+            logging.warning(f"Closing WebSocket client {client.peer}: {e}")
+            # 1009: message too big.
+            writer.write(websocket_frame(struct.pack('!H', 1009), opcode=0x8))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            with self._clients_lock:
+                self.ws_clients.discard(client)
+                self.dropped += client.dropped
+            sender.cancel()
+            writer.close()
+
+    async def _handshake(self, reader, writer):
+        request = await reader.readuntil(b'\r\n\r\n')
+        lines = request.decode('latin-1').split('\r\n')
+        path = lines[0].split(' ')[1] if lines[0].count(' ') >= 2 else '/'
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if not key or 'websocket' not in headers.get('upgrade', '').lower():
+            writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            writer.close()
+            return None
+        accept = base64.b64encode(hashlib.sha1(key.encode() + _WS_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+        return path
+
+    def stats(self):
+        with self._clients_lock:
+            ws_clients = len(self.ws_clients)
+            dropped = self.dropped + sum(client.dropped for client in self.ws_clients)
+        return {
+            'ws_clients': ws_clients,
+            'udp_clients': len(self.udp_clients),
+            'frames': self.frames,
+            'bytes_sent': self.bytes_sent,
+            'dropped': dropped,
+            'publish_ms': self.publish_ms,
+        }
+
+    def close(self):
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join(5)
+
+
+async def _websocket_client(host, port, samples, stop, delay=0.0, ack=False):
+    """Simulated WebSocket renderer: receive frames until STOP, appending (latency, sequence, size).
+
+    A client with a per-frame DELAY also gets small socket and stream
+    buffers, like a renderer at the far end of a slow link. With ACK it
+    connects to `/?ack` and acknowledges each frame once it is done with it.
+    """
+    if delay:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        reader, writer = await asyncio.open_connection(sock=sock, limit=1024)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET {'/?ack' if ack else '/'} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    await reader.readuntil(b'\r\n\r\n')
+    try:
+        while not stop.is_set():
+            _, payload = await read_websocket_frame(reader)
+            frame = decode_frame(payload)
+            samples.append((time.time() - frame['sent_at'], frame['sequence'], len(payload)))
+            if delay:
+                await asyncio.sleep(delay)
+            if ack:
+                # Client frames are masked; an all-zero mask leaves the payload as is.
+                writer.write(b'\x82\x81\x00\x00\x00\x00\x01')
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+class _UdpClient(asyncio.DatagramProtocol):
+    def __init__(self, samples):
+        self.samples = samples
+
+    def datagram_received(self, data, addr):
+        frame = decode_frame(data)
+        self.samples.append((time.time() - frame['sent_at'], frame['sequence'], len(data)))
+
+
+async def _udp_client(host, port, samples, stop):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: _UdpClient(samples), remote_addr=(host, port))
+    try:
+        while not stop.is_set():
+            transport.sendto(b'hello')  # subscribe, then keep alive
+            try:
+                await asyncio.wait_for(stop.wait(), 2.0)
+            except asyncio.TimeoutError:
+                pass
+        transport.sendto(b'bye')
+    finally:
+        transport.close()
+
+
+def load_test(clients=100, transport='ws', duration=5.0, rate=60, bands=16, slow_clients=0, slow_delay=0.1,
+              ack=False):
+    """Serve synthetic frames to CLIENTS simulated renderers and report fan-out latency and throughput.
+
+    The server runs on its own thread as it would inside main.py; the
+    clients share a second event loop. `slow_clients` extra WebSocket
+    clients sleep `slow_delay` seconds per frame to show that they drop
+    frames instead of slowing the others down. With ACK every WebSocket
+    client acknowledges the frames it has handled.
+    """
+    server = FeatureServer(ws_port=0 if transport in ('ws', 'both') or slow_clients else None,
+                           udp_port=0 if transport in ('udp', 'both') else None, rate=rate,
+                           udp_max_clients=max(clients, 64)).start()
+    publishing = threading.Event()
+    rng = np.random.default_rng(0)
+
+    def publisher():
+        # A render loop faster than the publish rate, so the server always has a fresh frame.
+        while not publishing.is_set():
+            server.publish(float(rng.uniform()), rng.uniform(0, 1, bands))
+            time.sleep(0.5 / rate)
+
+    async def run_clients():
+        stop = asyncio.Event()
+        fast, slow, tasks = [], [], []
+        for i in range(clients):
+            samples = []
+            fast.append(samples)
+            if transport == 'udp' or (transport == 'both' and i % 2):
+                tasks.append(asyncio.create_task(_udp_client(server.host, server.udp_port, samples, stop)))
+            else:
+                tasks.append(asyncio.create_task(_websocket_client(server.host, server.ws_port, samples, stop, ack=ack)))
+        for _ in range(slow_clients):
+            samples = []
+            slow.append(samples)
+            tasks.append(asyncio.create_task(_websocket_client(server.host, server.ws_port, samples, stop,
+                                                               delay=slow_delay, ack=ack)))
+        await asyncio.sleep(0.5)  # let everyone connect and subscribe
+        for samples in fast + slow:
+            samples.clear()
+        frames_before = server.frames
+        started = time.perf_counter()
+        await asyncio.sleep(duration)
+        elapsed = time.perf_counter() - started
+        frames = server.frames - frames_before
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return fast, slow, frames, elapsed
+
+    thread = threading.Thread(target=publisher, daemon=True)
+    thread.start()
+    try:
+        fast, slow, frames, elapsed = asyncio.run(run_clients())
+        dropped = server.stats()['dropped']
+    finally:
+        publishing.set()
+        thread.join()
+        server.close()
+
+    received = [sample for samples in fast for sample in samples]
+    latency = np.array([sample[0] for sample in received]) * 1000 if received else np.zeros(1)
+    expected = frames * clients
+    report = {
+        'transport': transport,
+        'clients': clients,
+        'rate': rate,
+        'duration_s': round(elapsed, 3),
+        'frames_published': frames,
+        'messages_received': len(received),
+        'delivery_ratio': len(received) / expected if expected else 0.0,
+        'messages_per_s': len(received) / elapsed,
+        'mb_per_s': sum(sample[2] for sample in received) / elapsed / 1048576,
+        'latency_ms': {
+            'mean': float(latency.mean()),
+            'p50': float(np.percentile(latency, 50)),
+            'p95': float(np.percentile(latency, 95)),
+            'p99': float(np.percentile(latency, 99)),
+            'max': float(latency.max()),
+        },
+        'server_publish_ms': server.publish_ms,
+    }
+    if slow_clients:
+        report['slow_clients'] = {
+            'clients': slow_clients,
+            'frames_per_client': sum(len(samples) for samples in slow) / slow_clients,
+            'server_dropped': dropped,
+            'max_latency_ms': max((sample[0] * 1000 for samples in slow for sample in samples), default=0.0),
+        }
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Voice Art feature broadcast server locally")
+    parser.add_argument("--clients", type=int, default=100, help="simulated clients keeping up with the stream")
+    parser.add_argument("--transport", choices=('ws', 'udp', 'both'), default='ws')
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to measure")
+    parser.add_argument("--rate", type=int, default=60, help="frames published per second")
+    parser.add_argument("--bands", type=int, default=16)
+    parser.add_argument("--slow-clients", type=int, default=0, help="extra WebSocket clients that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.1, help="seconds a slow client spends per frame")
+    parser.add_argument("--ack", action="store_true", help="WebSocket clients acknowledge every frame")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = load_test(args.clients, args.transport, args.duration, args.rate, args.bands,
+                       args.slow_clients, args.slow_delay, args.ack)
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import pygame
+import math
+import numpy as np
+from functools import lru_cache
+from colors import hsv_to_rgb_array
+
+@lru_cache(maxsize=None)
+def tree_geometry(max_depth):
+    """Unit-length branch segments of the fractal tree in drawing order.
+
+    Returns (starts, ends, depths): starts/ends are (n, 2) arrays for a trunk of
+    length 1 rooted at the origin, depths is the recursion depth of each segment.
+    """
+    starts, ends, depths = [], [], []
+
+    def branch(x, y, length, depth, angle):
+        if depth <= 0:
+            return
+        end_x = x + math.cos(angle) * length
+        end_y = y - math.sin(angle) * length
+        starts.append((x, y))
+        ends.append((end_x, end_y))
+        depths.append(depth)
+        branch_angle = 0.35 + (1 - depth / max_depth) * 0.25
+        branch(end_x, end_y, length * 0.75, depth - 1, angle + branch_angle)
+        branch(end_x, end_y, length * 0.75, depth - 1, angle - branch_angle)
+
+    branch(0.0, 0.0, 1.0, max_depth, -math.pi / 2)
+    return np.array(starts), np.array(ends), np.array(depths)
+
+@lru_cache(maxsize=None)
+def sierpinski_geometry(max_depth):
+    """Unit-size leaf triangles of the Sierpinski gasket as an (n, 3, 2) array."""
+    triangles = np.array([[[0.0, -1.0], [-0.866, 0.5], [0.866, 0.5]]])
+    for _ in range(max_depth):
+        p1, p2, p3 = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+        p12, p23, p31 = (p1 + p2) / 2, (p2 + p3) / 2, (p3 + p1) / 2
+        triangles = np.stack((
+            np.stack((p1, p12, p31), axis=1),
+            np.stack((p12, p2, p23), axis=1),
+            np.stack((p31, p23, p3), axis=1),
+        ), axis=1).reshape(-1, 3, 2)
+    return triangles
+
+class FractalRenderer:
+    """Draws the tree and Sierpinski fractals from cached unit geometry."""
+
+    def prepare(self, depths):
+        """Build the geometry for DEPTHS now, so switching to them never stalls a frame."""
+        for max_depth in depths:
+            tree_geometry(max_depth)
+            sierpinski_geometry(max_depth)
+
+    def draw_tree(self, surface, x, y, size, max_depth, color_shift, scale=1.0):
+        """Draw the tree and return its bounding Rect.
+
+        `scale` is the layer's render scale, already applied to x, y and size.
+        """
+        starts, ends, depths = tree_geometry(max_depth)
+        lengths = size * 0.75 ** (max_depth - depths)
+        keep = lengths >= 2 * scale
+        p0 = (starts[keep] * size + (x, y)).astype(int)
+        p1 = (ends[keep] * size + (x, y)).astype(int)
+        if not len(p0):
+            return None
+        # Per-depth colour and thickness lookup tables, indexed by depth.
+        levels = np.arange(max_depth + 1)
+        colors = [tuple(c) for c in hsv_to_rgb_array((color_shift + levels * 40) % 360,
+                                                     0.8 - levels / max_depth * 0.2,
+                                                     0.9 - levels / max_depth * 0.2).tolist()]
+        thickness = [max(1, int(d * 1.5 * scale)) for d in range(max_depth + 1)]
+        pad = max(thickness)
+        corners = np.concatenate((p0, p1))
+        left, top = (corners.min(axis=0) - pad).tolist()
+        right, bottom = (corners.max(axis=0) + pad).tolist()
+        p0, p1 = p0.tolist(), p1.tolist()
+        line = pygame.draw.line
+        for a, b, d in zip(p0, p1, depths[keep].tolist()):
+            line(surface, colors[d], a, b, thickness[d])
+        return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+
+    def draw_sierpinski(self, surface, x, y, size, max_depth, color_shift):
+        """Draw the gasket's leaf triangles at SIZE and return the Rect it covers."""
+        corners = sierpinski_geometry(max_depth).reshape(-1, 2)
+        # Two flat coordinate lists convert far faster than a nested (n, 3, 2) tolist().
+        points = iter(zip((corners[:, 0] * size + x).tolist(), (corners[:, 1] * size + y).tolist()))
+        color = tuple(hsv_to_rgb_array(color_shift % 360, 0.9, 1.0).tolist())
+        polygon = pygame.draw.polygon
+        for triangle in zip(points, points, points):
+            polygon(surface, color, triangle)
+        # The leaves fill the outer triangle's bounding box.
+        left, top = math.floor(x - 0.866 * size), math.floor(y - size)
+        right, bottom = math.ceil(x + 0.866 * size), math.ceil(y + 0.5 * size)
+        return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
@@ -0,0 +1,39 @@
+import pygame
+
+class GlyphText:
+    """Draws text from a cache of pre-rendered glyphs instead of rendering every frame."""
+
+    def __init__(self, name="monospace", size=16, color=(255, 255, 255)):
+        self.name = name
+        self.size = size
+        self.font = None
+        self.color = color
+        self.glyphs = {}
+
+    def _glyph(self, char):
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            if self.font is None:
+                # SysFont scans the system fonts, so wait until text is first shown rather than delay startup.
+                self.font = pygame.font.SysFont(self.name, self.size)
+            glyph = self.glyphs[char] = self.font.render(char, True, self.color)
+        return glyph
+
+    def draw(self, surface, text, pos):
+        x, y = pos
+        blits = []
+        for char in text:
+            glyph = self._glyph(char)
+            blits.append((glyph, (x, y)))
+            x += glyph.get_width()
+        surface.blits(blits, doreturn=False)
+        return x
+
+    def draw_lines(self, surface, lines, pos, spacing=20):
+        """Draw LINES top to bottom from POS; return the Rect they cover."""
+        x, y = pos
+        right = x
+        for line in lines:
+            right = max(right, self.draw(surface, line, (x, y)))
+            y += spacing
+        return pygame.Rect(x, pos[1], right - x, y - pos[1])
@@ -1,34 +1,140 @@
+import time
+# Taken before the heavy imports below, so time-to-first-frame includes them.
+STARTED = time.perf_counter()
 import pygame
 import sys
-import time
+import random
+import argparse
 import numpy as np
-from audio_capture import AudioCapture
-from audio_analysis import AudioAnalysis
-from visualizer import Visualizer
+from collections import deque
+from audio_analysis import AudioAnalysis, MultiChannelAnalysis
+from audio_sources import create_source, create_multi_source, source_rate
+from analysis_process import AnalysisProcess, process_device
+from calibration import CalibrationProfiles
+from feature_log import FeatureRecorder, FeatureReplay
+from feature_server import FeatureServer
+from visualizer import Visualizer, LAYERS
+from profiler import FrameProfiler
+from hud import GlyphText
+from quality import QualityGovernor
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
 class VoiceArt:
-    def __init__(self):
+    def __init__(self, args=None):
+        args = args if args is not None else parse_args([])
+        self.startup = [('imports', time.perf_counter())]
         pygame.init()
         pygame.display.set_caption("Voice Art 2.0")
         self.fullscreen = False
         self.width, self.height = 1280, 720
         self.setup_display()
-        self.analysis = AudioAnalysis()
-        self.audio = AudioCapture(processor=self.analysis)
-        self.visualizer = Visualizer(self.width, self.height)
+        self.startup.append(('display', time.perf_counter()))
+        self.profiler = FrameProfiler()
+        self.profile_out = args.profile_out
+        # Recordings carry their own calibration.
+        self.calibration_profiles = None if args.replay else CalibrationProfiles(args.calibration_cache)
+        self.recalibrate = args.recalibrate
+        self._next_calibration_save = 0.0
+        if args.replay:
+            # Recorded analysis output stands in for capture and analysis; --fast plays one record per frame.
+            self.analysis = self.audio = FeatureReplay(args.replay, speed=args.replay_speed, loop=args.loop,
+                                                       step=args.fast, start=args.replay_seek)
+        elif args.analysis_process:
+            # Capture and analysis run in a child process; one object stands in for both.
+            # The child starts listening straight away, so it takes the saved profile up front.
+            self.analysis = self.audio = AnalysisProcess(args.source[0], realtime=not args.fast, loop=args.loop,
+                                                         seed=args.seed, raw_rate=args.raw_rate,
+                                                         raw_channels=args.raw_channels,
+                                                         calibration=self.saved_calibration(process_device(args.source[0])))
+        else:
+            channels = len(args.source) if len(args.source) > 1 else args.channels
+            # The analysis is the source's processor, so it is built first, at the rate the source will deliver.
+            rate = source_rate(args.source[0], raw_rate=args.raw_rate)
+            # Several zones are analysed together; the visuals follow their mix.
+            self.analysis = MultiChannelAnalysis(channels, rate=rate) if channels > 1 else AudioAnalysis(rate=rate)
+            self.analysis.profiler = self.profiler
+            options = dict(rate=rate, processor=self.analysis, realtime=not args.fast, loop=args.loop, seed=args.seed,
+                           raw_rate=args.raw_rate, raw_channels=args.raw_channels)
+            if len(args.source) > 1:
+                self.audio = create_multi_source(args.source, **options)
+            else:
+                self.audio = create_source(args.source[0], channels=channels, **options)
+            self.analysis.start_calibration(3, self.saved_calibration(self.audio.device, self.analysis.rows))
+        self.startup.append(('audio', time.perf_counter()))
+        self.visualizer = Visualizer(self.width, self.height, prewarm_sprites=True, profiler=self.profiler,
+                                     render_scale=args.render_scale, layer_scales=parse_layer_scales(args.layer_scale),
+                                     full_redraw=args.full_redraw,
+                                     # A replay also fixes the visual randomness, so it reproduces exactly.
+                                     rng=random.Random(args.seed) if args.replay else None)
+        self.startup.append(('visualizer', time.perf_counter()))
+        self.recorder = FeatureRecorder(args.record) if args.record else None
+        self.server = None
+        if args.serve_ws is not None or args.serve_udp is not None:
+            udp_allow = ['127.0.0.0/8', '::1'] + args.serve_udp_allow
+            self.server = FeatureServer(args.serve_host, args.serve_ws, args.serve_udp, rate=args.serve_rate,
+                                        udp_allow=udp_allow).start()
+        self.target_fps = args.target_fps
+        self.governor = None
+        # A stepped replay must draw the same frames every run, whatever the frame times.
+        if args.replay and args.fast and not args.no_governor:
+            logging.info("Quality governor off for --replay --fast.")
+        elif not args.no_governor:
+            self.governor = QualityGovernor(target_fps=self.target_fps)
+            self.visualizer.prepare_quality(self.governor.levels)
+            self.visualizer.apply_quality(self.governor.settings)
         self.clock = pygame.time.Clock()
-        self.fps_history = []
+        self.fps_history = deque(maxlen=60)
+        self.debug_text = GlyphText("monospace", 16)
         self.last_time = time.time()
         self.running = True
         self.show_debug = False
         self.paused = False
+        self.exit_after = args.exit_after
+        self.frames = 0
+        self.time_to_first_frame = None
         print("Starting Voice Art 2.0...")
-        print("Calibrating audio - please make some noise...")
-        self.analysis.calibrate(3)
-        print("Calibration complete! Press 'D' for debug, 'F' for fullscreen, 'SPACE' to pause, 'ESC' to exit")
+        if not args.replay:
+            print("Calibrating audio in the background - please make some noise...")
+        print("Press 'D' for debug, 'F' for fullscreen, 'SPACE' to pause, 'ESC' to exit")
+
+    def saved_calibration(self, device, rows=1):
+        """The calibration profile saved for DEVICE, unless profiles are off, DEVICE has none or --recalibrate was given."""
+        if self.calibration_profiles is None or device is None or self.recalibrate:
+            return None
+        profile = self.calibration_profiles.get(device, rows)
+        if profile:
+            logging.info(f"Starting from the saved calibration for {device} ({profile['seconds']:.0f} s of audio).")
+        return profile
+
+    def save_calibration(self, final=False):
+        """Save the calibration as the device's profile once it rests on 30 s of audio, at most once a minute.
+
+        Only input devices get profiles; files and synthetic sources would only fill the cache.
+        """
+        now = time.perf_counter()
+        if self.calibration_profiles is None or self.audio.device is None:
+            return
+        if now < self._next_calibration_save and not final:
+            return
+        self._next_calibration_save = now + 60
+        stats = self.analysis.calibration_stats()
+        if stats and stats['ready'] and stats['seconds'] >= 30:
+            self.calibration_profiles.save(self.audio.device, stats['max_volume'], stats['noise_floor'],
+                                           stats['seconds'], stats['histogram'])
+
+    def report_startup(self):
+        now = time.perf_counter()
+        self.startup.append(('first frame', now))
+        self.time_to_first_frame = now - STARTED
+        self.profiler.record('first_frame', self.time_to_first_frame)
+        previous = STARTED
+        phases = []
+        for name, at in self.startup:
+            phases.append(f"{name} {(at - previous) * 1000:.0f}")
+            previous = at
+        logging.info(f"First frame {self.time_to_first_frame * 1000:.0f} ms after start ({', '.join(phases)} ms).")
 
     def setup_display(self):
         if self.fullscreen:
@@ -36,7 +142,6 @@ class VoiceArt:
             self.width, self.height = self.screen.get_size()
         else:
             self.screen = pygame.display.set_mode((self.width, self.height))
-        self.buffer = pygame.Surface((self.width, self.height))
 
     def toggle_fullscreen(self):
         self.fullscreen = not self.fullscreen
@@ -54,60 +159,219 @@ class VoiceArt:
                     self.toggle_fullscreen()
                 elif event.key == pygame.K_d:
                     self.show_debug = not self.show_debug
+                elif event.key == pygame.K_r:
+                    self.visualizer.set_full_redraw(not self.visualizer.full_redraw)
                 elif event.key == pygame.K_SPACE:
                     self.paused = not self.paused
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT) and hasattr(self.audio, 'seek'):
+                    step = 5.0 if event.key == pygame.K_RIGHT else -5.0
+                    self.audio.seek(self.audio.position + step)
+                elif event.key in (pygame.K_MINUS, pygame.K_EQUALS) and hasattr(self.audio, 'seek'):
+                    self.audio.speed *= 2.0 if event.key == pygame.K_EQUALS else 0.5
 
     def update(self):
+        self.audio.poll()
+        # Drain onsets even while paused so they do not all burst on resume.
+        onsets = self.analysis.get_onsets()
         if not self.paused:
             volume = self.analysis.get_volume()
             freq_data = self.analysis.get_frequency_data()
-            self.visualizer.update(volume, freq_data)
+            beat_phase = self.analysis.get_beat_phase()
+            self.visualizer.update(volume, freq_data, onsets, beat_phase)
+            if self.server:
+                self.server.publish(volume, freq_data, onsets, beat_phase)
+            if self.recorder:
+                self.recorder.record(volume, freq_data, onsets, beat_phase,
+                                     self.analysis.max_volume, self.analysis.noise_floor)
+            now = time.perf_counter()
+            for onset in onsets:
+                # Capture to the frame that spawns the burst; presenting it adds the render time.
+                self.profiler.record('onset_latency', now - onset.captured_at)
+        self.save_calibration()
 
     def render(self):
-        self.buffer.fill((0, 0, 0))
-        self.visualizer.render(self.buffer)
+        with self.profiler.stage('render'):
+            # The backdrop covers the whole frame, so the layers composite straight onto the display.
+            rects = self.visualizer.render(self.screen)
         if self.show_debug:
-            self.render_debug_info()
-        self.screen.blit(self.buffer, (0, 0))
-        pygame.display.flip()
+            # The overlay is drawn over the composite, so its area is recomposited next frame.
+            debug_rect = self.render_debug_info(rects)
+            self.visualizer.invalidate(debug_rect)
+            rects.append(debug_rect)
+        with self.profiler.stage('present'):
+            pygame.display.update(rects)
 
-    def render_debug_info(self):
+    def render_debug_info(self, rects):
         current_time = time.time()
         delta = current_time - self.last_time
         self.last_time = current_time
         fps = 1.0 / delta if delta > 0 else 0
         self.fps_history.append(fps)
-        if len(self.fps_history) > 60:
-            self.fps_history.pop(0)
         avg_fps = sum(self.fps_history) / len(self.fps_history)
 
-        font = pygame.font.SysFont("monospace", 16)
+        cache = self.visualizer.sprite_cache.stats()
+        audio = self.audio.stats()
+        onset = self.analysis.onset_stats()
+        quality = "fixed"
+        if self.governor:
+            quality = (f"level {self.governor.level}/{len(self.governor.levels) - 1} "
+                       f"(work {self.governor.average * 1000:.1f}/{self.governor.budget * 1000:.1f} ms)")
+        if self.visualizer.dirty_rects_active:
+            area = sum(rect.width * rect.height for rect in rects) / (self.width * self.height)
+            redraw = f"dirty rects, {len(rects)} rects covering {area * 100:.0f}% of the screen"
+        else:
+            redraw = "full frame"
+        calibration = self.analysis.calibration_stats()
+        if calibration is None:
+            calibration = "recorded"
+        elif calibration['ready'] or calibration['from_profile']:
+            calibration = (f"{'saved profile, ' if calibration['from_profile'] else ''}"
+                           f"refined from {calibration['seconds']:.0f} s of audio")
+        else:
+            calibration = f"listening {calibration['seconds']:.1f}/{calibration['duration']:g} s"
         debug_texts = [
             f"FPS: {avg_fps:.1f}",
             f"Volume: {self.analysis.get_volume():.2f}/{self.analysis.max_volume:.2f}",
             f"Particles: {self.visualizer.particle_count}",
+            f"Quality: {quality}",
+            f"Render scale: " + " ".join(f"{name}={scale:g}" for name, scale in self.visualizer.layer_scales.items()),
+            f"Redraw: {redraw}",
+            f"Startup: first frame {self.time_to_first_frame * 1000 if self.time_to_first_frame else 0:.0f} ms, "
+            f"calibration {calibration}",
+            f"Sprites: {cache['sprites']} ({cache['bytes'] / 1048576:.1f} MB) "
+            f"hit {cache['hits']} miss {cache['misses']} evict {cache['evictions']}",
+            f"Onsets: {onset['onsets']} tempo {onset['tempo_bpm']:.1f} BPM phase {format_phase(self.analysis.get_beat_phase())} "
+            f"detect latency {onset['avg_latency_ms']:.1f} ms (max {onset['max_latency_ms']:.1f})",
+            f"Audio ({self.audio.name}): dropped {audio.get('dropped', 0)} overflow {audio['overflows']} "
+            f"latency {audio.get('latency_ms', 0):.1f} ms (max {audio.get('max_latency_ms', 0):.1f})"
+            + (f" restarts {audio['restarts']}" if 'restarts' in audio else "")
+            + (f" at {audio['position']:.1f}/{audio['duration']:.1f} s x{audio['speed']:g}" if 'position' in audio else ""),
+        ]
+        if hasattr(self.analysis, 'get_channel_volumes'):
+            debug_texts.append("Channels: " + " ".join(f"{volume:.2f}" for volume in self.analysis.get_channel_volumes()))
+        if self.server:
+            served = self.server.stats()
+            debug_texts.append(f"Serving: {served['ws_clients']} WebSocket {served['udp_clients']} UDP clients, "
+                               f"{served['frames']} frames, {served['dropped']} dropped")
+        debug_texts += [
             f"Press 'F' for fullscreen",
             f"Press 'D' to hide debug",
+            f"Press 'R' to toggle full redraw",
             f"Press 'SPACE' to pause",
-            f"Press 'ESC' to exit"
+            f"Press LEFT/RIGHT to seek and -/= to change speed when replaying",
+            f"Press 'ESC' to exit",
+            "",
+            f"{'stage':<17}{'mean':>7}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7} ms",
         ]
-        y = 10
-        for text in debug_texts:
-            surface = font.render(text, True, (255, 255, 255))
-            self.buffer.blit(surface, (10, y))
-            y += 20
+        for name, s in self.profiler.summary().items():
+            debug_texts.append(f"{name:<17}{s['mean']:7.2f}{s['p50']:7.2f}{s['p95']:7.2f}{s['p99']:7.2f}{s['max']:7.2f}")
+        return self.debug_text.draw_lines(self.screen, debug_texts, (10, 10))
 
     def run(self):
         try:
             while self.running:
-                self.handle_events()
-                self.update()
-                self.render()
-                self.clock.tick(60)
+                started = time.perf_counter()
+                with self.profiler.stage('frame'):
+                    with self.profiler.stage('handle_events'):
+                        self.handle_events()
+                    self.update()
+                    self.render()
+                self.frames += 1
+                if self.time_to_first_frame is None:
+                    self.report_startup()
+                if self.exit_after and self.frames >= self.exit_after:
+                    self.running = False
+                if self.governor and self.governor.update(time.perf_counter() - started):
+                    self.visualizer.apply_quality(self.governor.settings)
+                self.clock.tick(self.target_fps)
         finally:
+            self.save_calibration(final=True)
             self.audio.close()
+            if self.server:
+                self.server.close()
+            if self.recorder:
+                self.recorder.close()
+            if self.profile_out:
+                self.profiler.export(self.profile_out)
             pygame.quit()
 
+def format_phase(phase):
+    return "-" if phase is None else f"{phase:.2f}"
+
+def render_scale(value):
+    """Parse a render scale, a fraction of the output resolution in (0, 1]."""
+    try:
+        scale = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a number")
+    if not 0 < scale <= 1:
+        raise argparse.ArgumentTypeError(f"scale {value} must be above 0 and at most 1")
+    return scale
+
+def layer_scale(spec):
+    """Parse one --layer-scale 'waves=0.5' into ('waves', 0.5)."""
+    name, _, value = spec.partition('=')
+    if name not in LAYERS:
+        raise argparse.ArgumentTypeError(f"unknown layer '{name}' in '{spec}', expected one of {', '.join(LAYERS)}")
+    try:
+        return name, render_scale(value)
+    except argparse.ArgumentTypeError as e:
+        raise argparse.ArgumentTypeError(f"{spec}: {e}")
+
+def parse_layer_scales(specs):
+    """Turn [('waves', 0.5), ('fractal', 0.5)] from --layer-scale into {'waves': 0.5, 'fractal': 0.5}."""
+    return dict(specs or [])
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Voice Art 2.0")
+    parser.add_argument("--source", action="append", default=None,
+                        help="audio input: mic, file:PATH (16-bit WAV), raw:PATH|- (int16 PCM), "
+                             "synth:tone|sweep|noise|claps; repeat to analyse several inputs as channels")
+    parser.add_argument("--channels", type=int, default=1,
+                        help="analyse this many channels of a multi-channel mic or file separately, plus their mix")
+    parser.add_argument("--fast", action="store_true", help="feed file/synthetic input as fast as possible")
+    parser.add_argument("--loop", action="store_true", help="loop file input")
+    parser.add_argument("--seed", type=int, default=0, help="seed for synthetic sources")
+    parser.add_argument("--raw-rate", type=int, default=None, help="sample rate of raw PCM input")
+    parser.add_argument("--raw-channels", type=int, default=1, help="channel count of raw PCM input")
+    parser.add_argument("--target-fps", type=int, default=60, help="frame rate the quality governor holds")
+    parser.add_argument("--no-governor", action="store_true", help="keep full quality regardless of frame time (implied by --replay --fast)")
+    parser.add_argument("--render-scale", type=render_scale, default=1.0,
+                        help="draw layers at this fraction of the output resolution and upscale at present")
+    parser.add_argument("--layer-scale", action="append", type=layer_scale, metavar="LAYER=SCALE",
+                        help=f"per-layer render scale override ({', '.join(LAYERS)})")
+    parser.add_argument("--analysis-process", action="store_true",
+                        help="run capture and analysis in a child process that publishes through shared memory")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="record the analysis output of every frame to PATH for later --replay")
+    parser.add_argument("--replay", metavar="PATH", default=None,
+                        help="drive the visuals from a --record file instead of capturing and analysing audio")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="playback speed of --replay")
+    parser.add_argument("--replay-seek", type=float, default=0.0, help="start --replay this many seconds in")
+    parser.add_argument("--serve-ws", type=int, metavar="PORT", default=None,
+                        help="broadcast volume and band frames to WebSocket clients on PORT")
+    parser.add_argument("--serve-udp", type=int, metavar="PORT", default=None,
+                        help="broadcast the same frames to UDP clients that send 'hello' to PORT")
+    parser.add_argument("--serve-udp-allow", metavar="NETWORK", action="append", default=[],
+                        help="also accept UDP subscribers from NETWORK, e.g. 192.168.1.0/24 (loopback always)")
+    parser.add_argument("--serve-host", default="127.0.0.1", help="address the feature server binds to")
+    parser.add_argument("--serve-rate", type=int, default=60, help="frames the feature server sends per second")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="composite and present the whole frame every time instead of dirty rectangles")
+    parser.add_argument("--calibration-cache", metavar="PATH", default=None,
+                        help="file keeping each input device's calibration (default ~/.cache/voice_art/calibration.json)")
+    parser.add_argument("--recalibrate", action="store_true",
+                        help="ignore the saved calibration and start from the defaults")
+    parser.add_argument("--exit-after", type=int, metavar="FRAMES", default=0,
+                        help="quit after this many frames, e.g. to time startup")
+    parser.add_argument("--profile-out", metavar="PATH", default=None,
+                        help="write per-stage frame timings to PATH (.json or .csv) on exit")
+    args = parser.parse_args(argv)
+    args.source = args.source or ["mic"]
+    if args.analysis_process and (len(args.source) > 1 or args.channels > 1):
+        parser.error("--analysis-process analyses a single mono source")
+    return args
+
 if __name__ == "__main__":
-    app = VoiceArt()
+    app = VoiceArt(parse_args())
     app.run()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import math
+import shlex
+import argparse
+import subprocess
+import logging
+
+# Offline rendering never opens a window.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from audio_analysis import AudioAnalysis
+from audio_sources import FileSource
+from visualizer import Visualizer
+
+logging.basicConfig(level=logging.INFO)
+
+class PngSequenceWriter:
+    """Writes each frame to DIRECTORY/frame_000000.png as it is rendered."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.frames = 0
+
+    def write(self, surface):
+        pygame.image.save(surface, os.path.join(self.directory, f"frame_{self.frames:06d}.png"))
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+class PipeWriter:
+    """Streams raw RGB24 frames to the stdin of an encoder process."""
+
+    def __init__(self, command):
+        self.command = command
+        self.process = subprocess.Popen(shlex.split(command) if isinstance(command, str) else command,
+                                        stdin=subprocess.PIPE)
+        self.frames = 0
+
+    def write(self, surface):
+        self.process.stdin.write(pygame.image.tostring(surface, "RGB"))
+        self.frames += 1
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            logging.error(f"Encoder exited with status {self.process.returncode}")
+
+
+def ffmpeg_command(output, width, height, fps, audio_path=None):
+    """ffmpeg invocation that encodes piped RGB24 frames (and the source audio) to OUTPUT."""
+    command = ["ffmpeg", "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+    if audio_path:
+        command += ["-i", audio_path, "-shortest"]
+    return command + ["-c:v", "libx264", "-pix_fmt", "yuv420p", output]
+
+
+def render_offline(audio_path, writer, width=1280, height=720, fps=60, duration=None, chunk=1024,
+                   raw=False, raw_rate=44100, raw_channels=1, report_every=120):
+    """Render AUDIO_PATH frame by frame on a fixed timestep and hand each frame to WRITER.
+
+    Returns a dict with the frame count, wall time and throughput.
+    """
+    pygame.init()
+    source = FileSource(audio_path, rate=raw_rate, chunk=chunk, raw=raw, channels=raw_channels)
+    rate = source.rate
+
+    # Calibrate on the whole file up front instead of listening for 3 seconds.
+    calibration = AudioAnalysis(chunk, rate)
+    volumes = []
+    block = chunk * 256
+    usable = len(source.samples) // chunk * chunk
+    for start in range(0, usable, block):
+        mono = source.samples[start:min(start + block, usable)].mean(axis=1).astype(np.int16)
+        volumes.extend(calibration.process_batch(mono.reshape(-1, chunk))[0].tolist())
+    analysis = AudioAnalysis(chunk, rate)
+    analysis.calibrate_from_volumes(volumes)
+
+    visualizer = Visualizer(width, height)
+    target = pygame.Surface((width, height))
+    total_frames = math.ceil((duration if duration else source.duration) * fps)
+    samples_per_frame = rate / fps
+    logging.info(f"Rendering {total_frames} frames at {width}x{height}, {fps} fps.")
+
+    started = time.perf_counter()
+    last_report = started
+    try:
+        for frame in range(total_frames):
+            # Analyse every chunk that starts before the end of this frame's time slice.
+            frame_end = (frame + 1) * samples_per_frame
+            while source.position < frame_end:
+                data = source.read_chunk()
+                if not data:
+                    break
+                analysis.process_audio(data)
+            visualizer.update(analysis.get_volume(), analysis.get_frequency_data(),
+                              analysis.get_onsets(), analysis.get_beat_phase())
+            visualizer.render(target)
+            writer.write(target)
+            if report_every and (frame + 1) % report_every == 0:
+                now = time.perf_counter()
+                logging.info(f"Frame {frame + 1}/{total_frames}: {report_every / (now - last_report):.1f} fps")
+                last_report = now
+    finally:
+        writer.close()
+        source.close()
+
+    elapsed = time.perf_counter() - started
+    result = {
+        'frames': total_frames,
+        'seconds': elapsed,
+        'fps': total_frames / elapsed if elapsed > 0 else 0.0,
+        'realtime_factor': (total_frames / fps) / elapsed if elapsed > 0 else 0.0,
+    }
+    logging.info(f"Rendered {result['frames']} frames in {elapsed:.1f} s: "
+                 f"{result['fps']:.1f} fps ({result['realtime_factor']:.2f}x real time)")
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render Voice Art offline from an audio file")
+    parser.add_argument("audio", help="16-bit WAV file (or raw PCM with --raw)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--png", metavar="DIR", help="write a PNG sequence to DIR")
+    output.add_argument("--pipe", metavar="CMD", help="pipe raw RGB24 frames to CMD's stdin")
+    output.add_argument("--ffmpeg", metavar="OUT", help="encode to OUT with ffmpeg, muxing the audio")
+    parser.add_argument("--size", default="1280x720", help="frame size WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=None, help="seconds to render (default: whole file)")
+    parser.add_argument("--raw", action="store_true", help="input is headerless int16 PCM")
+    parser.add_argument("--raw-rate", type=int, default=44100)
+    parser.add_argument("--raw-channels", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    if args.png:
+        writer = PngSequenceWriter(args.png)
+    elif args.pipe:
+        writer = PipeWriter(args.pipe)
+    else:
+        writer = PipeWriter(ffmpeg_command(args.ffmpeg, width, height, args.fps,
+                                           None if args.raw else args.audio))
+    render_offline(args.audio, writer, width, height, args.fps, args.duration,
+                   raw=args.raw, raw_rate=args.raw_rate, raw_channels=args.raw_channels)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import numpy as np
+import time
+import logging
+from collections import deque
+from numpy.lib.stride_tricks import sliding_window_view
+
+logging.basicConfig(level=logging.INFO)
+
+def beat_phase(stream_time, beat_period, beat_anchor):
+    """Position within the beat in [0, 1) at STREAM_TIME, None while no tempo is known."""
+    if not beat_period:
+        return None
+    return ((stream_time - beat_anchor) / beat_period) % 1.0
+
+class Onset:
+    """One detected attack."""
+    __slots__ = ('time', 'strength', 'captured_at', 'detected_at')
+
+    def __init__(self, time, strength, captured_at, detected_at):
+        self.time = time                # stream time of the hop that triggered it, in seconds
+        self.strength = strength        # spectral flux relative to the adaptive threshold (> 1)
+        self.captured_at = captured_at  # perf_counter() when the chunk holding it was captured
+        self.detected_at = detected_at  # perf_counter() when it was detected
+
+class OnsetDetector:
+    """Streaming spectral-flux onset detector with a running tempo estimate.
+
+    Audio is cut into overlapping `frame_size` frames every `hop_size`
+    samples, independent of the capture chunk size. The frames completed by
+    each call are transformed in one batched rfft. Flux is the mean positive
+    change of the log-compressed magnitude spectrum. A hop is an onset when
+    its flux exceeds an exponential moving mean plus `sensitivity` mean
+    deviations and is rising, with at least `min_interval` seconds since the
+    previous onset. Threshold state is O(1) per hop.
+
+    Tempo comes from a decaying histogram of inter-onset intervals folded
+    into [min_bpm, max_bpm], updated only when an onset fires. The beat anchor
+    is phase-locked towards onsets that land near a predicted beat.
+    """
+
+    def __init__(self, rate=44100, frame_size=1024, hop_size=256, sensitivity=2.0, floor=0.02,
+                 min_interval=0.08, window_seconds=1.0, min_bpm=60, max_bpm=180, max_events=64):
+        self.rate = rate
+        self.frame_size = frame_size
+        self.hop_size = hop_size
+        self.sensitivity = sensitivity
+        self.floor = floor
+        self.min_interval = min_interval
+        self.window = np.hanning(frame_size)
+        self.window.flags.writeable = False
+        self.compression = 1e-3
+        self.alpha = min(1.0, hop_size / (rate * window_seconds))
+        # Samples from the start of the next frame onwards; zero-padded so the first hop completes a frame.
+        self._history = np.zeros(frame_size - hop_size)
+        self._previous = np.zeros(frame_size // 2 + 1)
+        self._previous_flux = 0.0
+        self._warmup = frame_size // hop_size
+        self.hops = 0
+        self.mean = 0.0
+        self.deviation = 0.0
+        self.last_flux = 0.0
+        self.last_onset = -np.inf
+        self.onset_count = 0
+        self.events = deque(maxlen=max_events)
+
+        self.min_lag = int(round(60 / max_bpm * rate / hop_size))
+        self.max_lag = int(round(60 / min_bpm * rate / hop_size))
+        self.interval_histogram = np.zeros(self.max_lag + 2)
+        self._recent_onsets = deque(maxlen=4)
+        self.beat_period = 0.0
+        self.beat_anchor = 0.0
+        self._beat_misses = 0
+
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def stream_time(self):
+        """Seconds of audio analysed so far, at the end of the last completed hop."""
+        return self.hops * self.hop_size / self.rate
+
+    @property
+    def tempo(self):
+        """Estimated tempo in BPM, or 0 while unknown."""
+        return 60.0 / self.beat_period if self.beat_period else 0.0
+
+    def beat_phase(self, at=None):
+        """Position within the current beat in [0, 1) at stream time AT (default: now), None while unknown."""
+        return beat_phase(self.stream_time if at is None else at, self.beat_period, self.beat_anchor)
+
+    def process(self, samples, captured_at=None):
+        """Feed mono samples of any length; return the number of onsets detected."""
+        if captured_at is None:
+            captured_at = time.perf_counter()
+        history = np.concatenate((self._history, samples))
+        count = (len(history) - self.frame_size) // self.hop_size + 1
+        if count <= 0:
+            self._history = history
+            return 0
+        frames = sliding_window_view(history, self.frame_size)[::self.hop_size][:count]
+        spectrum = np.log1p(np.abs(np.fft.rfft(frames * self.window, axis=1)) * self.compression)
+        rise = np.diff(spectrum, axis=0, prepend=self._previous[None, :])
+        flux = np.maximum(rise, 0).mean(axis=1).tolist()
+        self._previous = spectrum[-1]
+        self._history = history[count * self.hop_size:]
+
+        detected = 0
+        for value in flux:
+            self.hops += 1
+            if self._step(value, captured_at):
+                detected += 1
+        return detected
+
+    def _step(self, flux, captured_at):
+        threshold = self.mean + self.sensitivity * self.deviation + self.floor
+        now = self.stream_time
+        onset = (self.hops > self._warmup and flux > threshold and flux > self._previous_flux
+                 and now - self.last_onset >= self.min_interval)
+        self.mean += (flux - self.mean) * self.alpha
+        self.deviation += (abs(flux - self.mean) - self.deviation) * self.alpha
+        self._previous_flux = flux
+        self.last_flux = flux
+        if not onset:
+            return False
+        detected_at = time.perf_counter()
+        self.last_onset = now
+        self.onset_count += 1
+        self.events.append(Onset(now, flux / threshold, captured_at, detected_at))
+        latency = detected_at - captured_at
+        self.last_latency = latency
+        self.avg_latency += (latency - self.avg_latency) * 0.1
+        self.max_latency = max(self.max_latency, latency)
+        self._update_tempo(now)
+        return True
+
+    def _update_tempo(self, now):
+        """Fold recent inter-onset intervals into the histogram and re-lock the beat anchor."""
+        hop_seconds = self.hop_size / self.rate
+        self.interval_histogram *= 0.9
+        # Nearer onsets weigh more, so multiples of the beat do not outvote it.
+        for distance, previous in enumerate(reversed(self._recent_onsets), 1):
+            weight = 1.0 / distance
+            lag = (now - previous) / hop_seconds
+            while lag > self.max_lag:
+                lag /= 2
+            while lag < self.min_lag:
+                lag *= 2
+            if lag <= self.max_lag:
+                bin_ = int(round(lag))
+                self.interval_histogram[bin_] += weight
+                self.interval_histogram[bin_ - 1] += weight * 0.5
+                self.interval_histogram[bin_ + 1] += weight * 0.5
+        self._recent_onsets.append(now)
+        best = int(np.argmax(self.interval_histogram))
+        if self.interval_histogram[best] < 2.0:
+            return
+        self.beat_period = best * hop_seconds
+        error = now - self.beat_anchor
+        error -= round(error / self.beat_period) * self.beat_period
+        if abs(error) < 0.2 * self.beat_period:
+            self.beat_anchor = now - error * 0.5
+            self._beat_misses = 0
+        else:
+            self._beat_misses += 1
+            if self._beat_misses >= 4 or not self.beat_anchor:
+                self.beat_anchor = now
+                self._beat_misses = 0
+
+    def drain(self):
+        """Return and remove the onsets detected since the last call. Safe from another thread."""
+        events = []
+        try:
+            while True:
+                events.append(self.events.popleft())
+        except IndexError:
+            return events
+
+    def stats(self):
+        return {
+            'onsets': self.onset_count,
+            'tempo_bpm': self.tempo,
+            'flux': self.last_flux,
+            'latency_ms': self.last_latency * 1000,
+            'avg_latency_ms': self.avg_latency * 1000,
+            'max_latency_ms': self.max_latency * 1000,
+        }
@@ -0,0 +1,123 @@
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+SPIRAL, RADIAL, WAVE = 0, 1, 2
+PATTERNS = {'spiral': SPIRAL, 'radial': RADIAL, 'wave': WAVE}
+
+class ParticleSystem:
+    """Fixed-capacity struct-of-arrays particle store with vectorized updates."""
+
+    def __init__(self, capacity=16384, trail_length=3, max_life=90, rng=None):
+        self.capacity = capacity
+        self.trail_length = trail_length
+        self.max_life = max_life
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.size = np.zeros(capacity)
+        self.base_size = np.zeros(capacity)
+        self.hue = np.zeros(capacity)
+        self.life = np.zeros(capacity, dtype=np.int32)
+        self.wave_phase = np.zeros(capacity)
+        self.freq_idx = np.zeros(capacity, dtype=np.int32)
+        self.pattern = np.zeros(capacity, dtype=np.int8)
+        # Trail ring buffer: every live particle appends once per step, so a
+        # single shared cursor addresses the newest slot for all of them.
+        self.trail = np.zeros((capacity, trail_length, 2), dtype=np.int32)
+        self.trail_count = np.zeros(capacity, dtype=np.int32)
+        self.trail_cursor = 0
+        self._fields = ('pos', 'vel', 'size', 'base_size', 'hue', 'life',
+                        'wave_phase', 'freq_idx', 'pattern', 'trail', 'trail_count')
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, count, pattern, origin, size, base_hue, time, volume, freq_bands):
+        """Spawn `count` particles of one pattern; excess beyond capacity is dropped."""
+        count = min(count, self.capacity - self.count)
+        if count <= 0:
+            return 0
+        s = slice(self.count, self.count + count)
+        code = PATTERNS[pattern]
+        j = np.arange(count)
+
+        self.hue[s] = (base_hue + self.rng.uniform(0, 360, count)) % 360
+        if code == SPIRAL:
+            angle = time * 0.1 + j * (2 * np.pi / count)
+            speed_x = speed_y = 2.0
+        elif code == RADIAL:
+            angle = j * (2 * np.pi / count)
+            speed_x = speed_y = 2 + volume * 3
+        else:
+            angle = self.rng.uniform(0, 2 * np.pi, count)
+            speed_x = 1 + volume * 2
+            speed_y = speed_x * 0.5
+        self.vel[s, 0] = np.cos(angle) * speed_x
+        self.vel[s, 1] = np.sin(angle) * speed_y
+        self.pos[s] = origin
+        self.size[s] = size
+        self.base_size[s] = size
+        self.life[s] = self.max_life
+        self.wave_phase[s] = self.rng.uniform(0, 2 * np.pi, count)
+        self.freq_idx[s] = self.rng.integers(0, freq_bands, count)
+        self.pattern[s] = code
+        self.trail_count[s] = 0
+        self.count += count
+        return count
+
+    def step(self, time, freq_data, max_y):
+        """Advance motion, size and hue modulation for all live particles."""
+        n = self.count
+        if n == 0:
+            return
+        phase = self.wave_phase[:n]
+        pattern = self.pattern[:n]
+        if freq_data.any():
+            amplitude = np.asarray(freq_data, dtype=np.float64)[self.freq_idx[:n]]
+        else:
+            amplitude = np.full(n, 0.5)
+        wave_factor = np.sin(time * 0.03 + phase) * amplitude * 1.5
+
+        drift_x = np.where(pattern == SPIRAL, 0.5, np.where(pattern == WAVE, 1.0, 0.0)) * wave_factor
+        drift_y = np.where(pattern == RADIAL, 0.0, 0.5) * wave_factor
+        pos = self.pos[:n]
+        pos += self.vel[:n]
+        pos[:, 0] += drift_x
+        pos[:, 1] += drift_y
+        np.minimum(pos[:, 1], max_y, out=pos[:, 1])
+
+        self.size[:n] = self.base_size[:n] * (1 + amplitude * 0.3 * np.sin(time * 0.08 + phase))
+        self.hue[:n] = (self.hue[:n] + 3 + amplitude * 5) % 360
+
+        self.trail_cursor = (self.trail_cursor + 1) % self.trail_length
+        self.trail[:n, self.trail_cursor] = pos.astype(np.int32)
+        np.minimum(self.trail_count[:n] + 1, self.trail_length, out=self.trail_count[:n])
+
+    def trail_points(self, age):
+        """Return trail positions `age` steps old (0 is newest) for all live particles."""
+        slot = (self.trail_cursor - age) % self.trail_length
+        return self.trail[:self.count, slot]
+
+    def age(self):
+        """Decrement life of live particles and swap-compact the ones that expired."""
+        n = self.count
+        if n == 0:
+            return
+        life = self.life[:n]
+        dead = life <= 0
+        life -= 1
+        if not dead.any():
+            return
+        keep = n - int(np.count_nonzero(dead))
+        holes = np.flatnonzero(dead[:keep])
+        movers = keep + np.flatnonzero(~dead[keep:])
+        for name in self._fields:
+            arr = getattr(self, name)
+            arr[holes] = arr[movers]
+        self.count = keep
+
+    def clear(self):
+        self.count = 0
@@ -0,0 +1,124 @@
+import numpy as np
+import time
+import json
+import threading
+import csv
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+class StageStats:
+    """Ring buffer of the most recent timings for one stage, in seconds."""
+
+    def __init__(self, capacity):
+        self.samples = np.zeros(capacity)
+        self.index = 0
+        self.count = 0
+        self.total_calls = 0
+
+    def record(self, seconds):
+        self.samples[self.index] = seconds
+        self.index = (self.index + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+        self.total_calls += 1
+
+    def summary(self):
+        """Mean and percentiles over the buffered window, in milliseconds."""
+        if self.count == 0:
+            return {'calls': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        window = self.samples[:self.count] * 1000
+        p50, p95, p99 = np.percentile(window, (50, 95, 99))
+        return {'calls': self.total_calls, 'mean': float(window.mean()), 'p50': float(p50),
+                'p95': float(p95), 'p99': float(p99), 'max': float(window.max())}
+
+
+class _StageTimer:
+    __slots__ = ('stats', 'started')
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class FrameProfiler:
+    """Per-stage frame timing with ring-buffered statistics.
+
+    `with profiler.stage('name'):` times a block; timers are created once per
+    stage and reused. A disabled profiler hands out a shared no-op timer.
+    record() may be called from other threads, such as the analysis worker;
+    stages are added and listed under a lock.
+    """
+
+    def __init__(self, capacity=300, enabled=True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.stages = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = self.stages[name] = StageStats(self.capacity)
+        return stats
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _StageTimer(self._stats(name))
+        return timer
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self._stats(name).record(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self._timers.clear()
+
+    def summary(self):
+        with self._lock:
+            stages = list(self.stages.items())
+        return {name: stats.summary() for name, stats in stages}
+
+    def export(self, path):
+        """Write the current summary to PATH as CSV (by extension) or JSON."""
+        summary = self.summary()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['stage', 'calls', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+                for name, s in summary.items():
+                    writer.writerow([name, s['calls'], f"{s['mean']:.4f}", f"{s['p50']:.4f}",
+                                     f"{s['p95']:.4f}", f"{s['p99']:.4f}", f"{s['max']:.4f}"])
+        else:
+            with open(path, 'w') as f:
+                json.dump({'unit': 'ms', 'window': self.capacity, 'stages': summary}, f, indent=2)
+        logging.info(f"Profile written to {path}")
@@ -0,0 +1,70 @@
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Level 0 is full quality; each further level trades detail for frame time.
+QUALITY_LEVELS = [
+    {'spawn_scale': 1.0, 'max_particles': 1000, 'trail_length': 3, 'fractal_depth': 6, 'wave_step': 5, 'star_count': 150},
+    {'spawn_scale': 0.75, 'max_particles': 700, 'trail_length': 3, 'fractal_depth': 6, 'wave_step': 6, 'star_count': 120},
+    {'spawn_scale': 0.5, 'max_particles': 450, 'trail_length': 2, 'fractal_depth': 5, 'wave_step': 8, 'star_count': 100},
+    {'spawn_scale': 0.35, 'max_particles': 250, 'trail_length': 1, 'fractal_depth': 5, 'wave_step': 10, 'star_count': 75},
+    {'spawn_scale': 0.25, 'max_particles': 120, 'trail_length': 0, 'fractal_depth': 4, 'wave_step': 16, 'star_count': 50},
+]
+
+class QualityGovernor:
+    """Steps quality down when frames run over budget and back up when there is headroom.
+
+    Frame times are smoothed with an exponential moving average. Dropping a
+    level needs `down_frames` consecutive frames over budget; raising one needs
+    `up_frames` consecutive frames under `headroom` of the budget, and no
+    change happens within `cooldown` frames of the last one, so quality does
+    not oscillate around the threshold.
+    """
+
+    def __init__(self, target_fps=60, levels=QUALITY_LEVELS, down_frames=30, up_frames=180,
+                 headroom=0.7, cooldown=60, smoothing=0.1):
+        self.budget = 1.0 / target_fps
+        self.levels = levels
+        self.down_frames = down_frames
+        self.up_frames = up_frames
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.level = 0
+        self.average = 0.0
+        self._over = 0
+        self._under = 0
+        self._since_change = cooldown
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def update(self, frame_seconds):
+        """Feed one frame's work time; return True when the quality level changed."""
+        if self.average == 0.0:
+            self.average = frame_seconds
+        self.average += (frame_seconds - self.average) * self.smoothing
+        self._since_change += 1
+        if self.average > self.budget:
+            self._over += 1
+            self._under = 0
+        elif self.average < self.budget * self.headroom:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+        if self._since_change < self.cooldown:
+            return False
+        if self._over >= self.down_frames and self.level < len(self.levels) - 1:
+            return self._set_level(self.level + 1)
+        if self._under >= self.up_frames and self.level > 0:
+            return self._set_level(self.level - 1)
+        return False
+
+    def _set_level(self, level):
+        logging.info(f"Quality level {self.level} -> {level} (frame time {self.average * 1000:.1f} ms)")
+        self.level = level
+        self._over = self._under = 0
+        self._since_change = 0
+        return True
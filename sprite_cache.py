@@ -0,0 +1,157 @@
+import pygame
+import time
+import logging
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+
+class SpriteCache:
+    """LRU cache of pre-rendered bubble sprites keyed on quantized (size, hue).
+
+    Pre-warmed sprites are subsurfaces of one atlas strip per size. Dropping
+    a subsurface would free none of its strip, so they are never evicted:
+    each strip counts against `max_bytes` once and the LRU gets the rest.
+    """
+
+    def __init__(self, render_func, max_bytes=64 * 1024 * 1024, hue_step=10, size_step=1):
+        self.render_func = render_func
+        self.max_bytes = max_bytes
+        self.hue_step = hue_step
+        self.size_step = size_step
+        self.sprites = OrderedDict()
+        self.atlas_sprites = {}
+        self.atlas = {}  # size -> strip of every pre-warmed hue at that size
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending = OrderedDict()  # key -> x offset in its strip, or None to render on its own
+        self._strip_widths = {}
+        self._prewarm_count = 0
+
+    def quantize(self, size, hue):
+        size = max(0, int(round(size / self.size_step)) * self.size_step)
+        hue_bucket = int(round((hue % 360) / self.hue_step)) % int(360 / self.hue_step)
+        return size, hue_bucket
+
+    def get(self, size, hue):
+        """Return the cached sprite for (size, hue), rendering it on a miss."""
+        key = self.quantize(size, hue)
+        sprite = self.atlas_sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            return sprite
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        if key in self._pending:
+            return self._render_pending(key, self._pending.pop(key))
+        sprite = self.render_func(key[0], key[1] * self.hue_step)
+        self._insert(key, sprite)
+        return sprite
+
+    def _insert(self, key, sprite):
+        cost = self._sprite_bytes(sprite)
+        self.sprites[key] = sprite
+        self.bytes_used += cost
+        while self.bytes_used > self.max_bytes and len(self.sprites) > 1:
+            _, old = self.sprites.popitem(last=False)
+            self.bytes_used -= self._sprite_bytes(old)
+            self.evictions += 1
+
+    def _sprite_bytes(self, sprite):
+        return sprite.get_width() * sprite.get_height() * sprite.get_bytesize()
+
+    def _render_pending(self, key, x):
+        size, hue_bucket = key
+        sprite = self.render_func(size, hue_bucket * self.hue_step)
+        if x is None:
+            self._insert(key, sprite)
+            return sprite
+        strip = self.atlas.get(size)
+        if strip is None:
+            # Strips are allocated as they are first needed, so no single frame pays for all of them.
+            strip = self.atlas[size] = pygame.Surface((self._strip_widths[size], size * 2), pygame.SRCALPHA)
+            self.bytes_used += self._sprite_bytes(strip)
+        strip.blit(sprite, (x, 0))
+        sprite = self.atlas_sprites[key] = strip.subsurface((x, 0, size * 2, size * 2))
+        return sprite
+
+    def prewarm(self, sizes, hues=None, spread=False):
+        """Render sprites for the given sizes and hue buckets into the atlas.
+
+        With `spread` they are only queued; prewarm_step() renders them a
+        few at a time, and get() renders a queued sprite as soon as it is
+        asked for.
+        """
+        if hues is None:
+            hues = range(0, 360, self.hue_step)
+        keys = []
+        seen = set(self.sprites) | set(self.atlas_sprites) | set(self._pending)
+        for size in sizes:
+            if size <= 0:
+                continue
+            for hue in hues:
+                key = self.quantize(size, hue)
+                if key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+        if not keys:
+            return
+
+        # Sizes that already have a strip from an earlier call are rendered on their own.
+        widths = {}
+        for size, _ in keys:
+            if size not in self._strip_widths:
+                widths[size] = widths.get(size, 0) + size * 2
+        atlas_bytes = sum(width * size * 2 * 4 for size, width in widths.items())
+        if atlas_bytes > self.max_bytes - self.bytes_used:
+            logging.info("Sprite atlas exceeds cache budget, pre-warming individually.")
+            widths = {}
+        self._strip_widths.update(widths)
+        offsets = dict.fromkeys(widths, 0)
+        for key in keys:
+            size = key[0]
+            if size in offsets:
+                self._pending[key] = offsets[size]
+                offsets[size] += size * 2
+            else:
+                self._pending[key] = None
+        self._prewarm_count += len(keys)
+        if not spread:
+            self.prewarm_step(None)
+
+    def prewarm_step(self, seconds=0.002):
+        """Render queued pre-warm sprites for up to SECONDS (all of them if None); return how many remain."""
+        if not self._pending:
+            return 0
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        while self._pending:
+            key, x = self._pending.popitem(last=False)
+            self._render_pending(key, x)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        if not self._pending:
+            logging.info(f"Pre-warmed {self._prewarm_count} bubble sprites "
+                         f"({len(self.atlas)} atlas strips, {self.bytes_used / 1048576:.1f} MB).")
+        return len(self._pending)
+
+    def clear(self):
+        self.sprites.clear()
+        self.atlas_sprites.clear()
+        self.atlas.clear()
+        self._pending.clear()
+        self._strip_widths.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        return {
+            'sprites': len(self.sprites) + len(self.atlas_sprites),
+            'bytes': self.bytes_used,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -3,47 +3,85 @@ import math
 import random
 import numpy as np
 import logging
+from sprite_cache import SpriteCache
+from background import CosmicBackground
+from fractals import FractalRenderer
+from particles import ParticleSystem
+from colors import hsv_to_rgb_array
+from profiler import FrameProfiler
 
 logging.basicConfig(level=logging.INFO)
 
+# Composite order, back to front.
+LAYERS = ('background', 'waves', 'fractal', 'equalizer', 'particles')
+
+def _bounds(x0, y0, x1, y1):
+    """Integer Rect covering the float box (x0, y0)-(x1, y1)."""
+    left, top = math.floor(x0), math.floor(y0)
+    return pygame.Rect(left, top, math.ceil(x1) - left + 1, math.ceil(y1) - top + 1)
+
+def _merge_rects(rects):
+    """Fold overlapping rects together where the union costs no more than both, largest first."""
+    merged = []
+    for rect in sorted(rects, key=lambda r: r.width * r.height, reverse=True):
+        for i, other in enumerate(merged):
+            if other.contains(rect):
+                break
+            if other.colliderect(rect):
+                union = other.union(rect)
+                if union.width * union.height <= other.width * other.height + rect.width * rect.height:
+                    merged[i] = union
+                    break
+        else:
+            merged.append(rect)
+    return merged
+
 class Visualizer:
-    def __init__(self, width, height):
+    def __init__(self, width, height, sprite_cache_mb=64, prewarm_sprites=False, max_particles=16384,
+                 fractal_depth=6, profiler=None, rng=None, render_scale=1.0, layer_scales=None,
+                 full_redraw=False):
         self.width = width
         self.height = height
-        self.background = pygame.Surface((width, height))
-        self.wave_layer = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.equalizer_layer = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.particle_layer = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.fractal_layer = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.rng = rng if rng is not None else random.Random()
+        # Dirty-rectangle compositing; only used while every layer is at full scale.
+        self.full_redraw = full_redraw
+        self.full_frame_ratio = 0.6
+        # Fraction of the output resolution each layer is drawn at; upscaled in render().
+        self.layer_scales = {name: render_scale for name in LAYERS}
+        self.layer_scales.update(layer_scales or {})
+        self._create_layers()
         self.time = 0
         self.particle_count = 0
-        self.particles = []
-        self.base_hue = random.uniform(0, 360)
+        self.profiler = profiler if profiler is not None else FrameProfiler(enabled=False)
+        self.particles = ParticleSystem(capacity=max_particles,
+                                        rng=np.random.default_rng(self.rng.getrandbits(64)))
+        self.spawn_scale = 1.0
+        self.particle_cap = max_particles
+        self.trail_length = self.particles.trail_length
+        self.wave_step = 5
+        self.burst_size = 12
+        self._wave_grid_key = None
+        self.sprite_cache = SpriteCache(self.create_bubble_surface, max_bytes=sprite_cache_mb * 1024 * 1024)
+        if prewarm_sprites:
+            # Rendered a couple of milliseconds per frame by update(), not before the first frame.
+            self.sprite_cache.prewarm(range(8, 49), spread=True)
+        self.base_hue = self.rng.uniform(0, 360)
         self.palette = self._generate_palette()
         self.waves = [
             {'amplitude': 30 + i * 15, 'frequency': 0.005 + i * 0.002,
-             'phase': random.uniform(0, 2 * math.pi), 'color': self.palette[i % len(self.palette)]}
+             'phase': self.rng.uniform(0, 2 * math.pi), 'color': self.palette[i % len(self.palette)]}
             for i in range(5)
         ]
         self.fractal_type = 'tree'
         self.fractal_x = width // 2
         self.fractal_y = height
         self.fractal_size = 120
-        self.max_depth = 6
+        self.max_depth = fractal_depth
+        self.fractals = FractalRenderer()
+        self.fractals.prepare([fractal_depth])
         self.color_shift = 0
         self.cosmic_phase = 0
-        self.stars = [(random.randint(0, width), random.randint(0, height), random.uniform(0.5, 2)) for _ in range(150)]
-        self.planets = [
-            {'name': 'Sun', 'x': width * 0.25, 'y': height * 0.5, 'radius': 30, 'color': (255, 204, 0), 'orbit': 0},
-            {'name': 'Mercury', 'x': 0, 'y': 0, 'radius': 5, 'color': (169, 169, 169), 'orbit': 50},
-            {'name': 'Venus', 'x': 0, 'y': 0, 'radius': 8, 'color': (255, 215, 0), 'orbit': 80},
-            {'name': 'Earth', 'x': 0, 'y': 0, 'radius': 10, 'color': (0, 191, 255), 'orbit': 110},
-            {'name': 'Mars', 'x': 0, 'y': 0, 'radius': 7, 'color': (255, 99, 71), 'orbit': 140},
-            {'name': 'Jupiter', 'x': 0, 'y': 0, 'radius': 20, 'color': (210, 180, 140), 'orbit': 200},
-            {'name': 'Saturn', 'x': 0, 'y': 0, 'radius': 18, 'color': (238, 232, 170), 'orbit': 260},
-            {'name': 'Uranus', 'x': 0, 'y': 0, 'radius': 14, 'color': (173, 216, 230), 'orbit': 310},
-            {'name': 'Neptune', 'x': 0, 'y': 0, 'radius': 13, 'color': (65, 105, 225), 'orbit': 350}
-        ]
+        self.background = CosmicBackground(width, height, rng=self.rng, scale=self.layer_scales['background'])
 
     def _generate_palette(self):
         palette = []
@@ -78,22 +116,93 @@ class Visualizer:
             pygame.draw.circle(surf, (*color, alpha), (size, size), radius)
         return surf
 
+    def _layer_size(self, name):
+        scale = self.layer_scales[name]
+        return max(1, int(self.width * scale)), max(1, int(self.height * scale))
+
+    def _create_layers(self):
+        self.wave_layer = pygame.Surface(self._layer_size('waves'), pygame.SRCALPHA)
+        self.equalizer_layer = pygame.Surface(self._layer_size('equalizer'), pygame.SRCALPHA)
+        self.particle_layer = pygame.Surface(self._layer_size('particles'), pygame.SRCALPHA)
+        self.fractal_layer = pygame.Surface(self._layer_size('fractal'), pygame.SRCALPHA)
+        self._scaled_buffers = {}
+        self.background_layer = None
+        self._layer_bounds = {name: None for name in LAYERS[1:]}
+        self._layer_keys = {name: None for name in LAYERS[1:]}
+        self._dirty = {name: [] for name in LAYERS[1:]}
+        self._invalid = []
+        self._background_phase = None
+
     def resize(self, width, height):
         self.width = width
         self.height = height
-        self.background = pygame.Surface((width, height))
-        self.wave_layer = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.equalizer_layer = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.particle_layer = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.fractal_layer = pygame.Surface((width, height), pygame.SRCALPHA)
+        self._create_layers()
         self.fractal_x = width // 2
         self.fractal_y = height
-        self.stars = [(random.randint(0, width), random.randint(0, height), random.uniform(0.5, 2)) for _ in range(150)]
-        self.planets[0]['x'] = width * 0.25
-        self.planets[0]['y'] = height * 0.5
+        self.background.resize(width, height, self.layer_scales['background'])
+
+    def set_layer_scales(self, render_scale=None, **layer_scales):
+        """Change the render scale of all layers and/or individual ones, keeping the output size."""
+        if render_scale is not None:
+            self.layer_scales = {name: render_scale for name in LAYERS}
+        self.layer_scales.update(layer_scales)
+        self.resize(self.width, self.height)
+
+    def set_full_redraw(self, full_redraw):
+        """Switch between dirty-rectangle and full-frame compositing."""
+        self.full_redraw = full_redraw
+        self.background_layer = None
+
+    @property
+    def dirty_rects_active(self):
+        return not self.full_redraw and all(scale == 1 for scale in self.layer_scales.values())
+
+    def invalidate(self, rect):
+        """Recomposite RECT on the next render, e.g. after drawing an overlay onto the output."""
+        self._invalid.append(pygame.Rect(rect))
+
+    def _clear_layer(self, name, layer):
+        """Erase what the layer drew last frame; the whole layer when redrawing fully."""
+        if self.full_redraw:
+            layer.fill((0, 0, 0, 0))
+        elif self._layer_bounds[name]:
+            layer.fill((0, 0, 0, 0), self._layer_bounds[name])
+
+    def _mark_layer(self, name, bounds, key=None):
+        """Record the layer's new content bounds; the dirty area is the old and new bounds combined."""
+        previous = self._layer_bounds[name]
+        self._layer_bounds[name] = bounds if bounds else None
+        self._layer_keys[name] = key
+        touched = [rect for rect in (previous, bounds) if rect]
+        if touched:
+            self._dirty[name].append(touched[0].unionall(touched[1:]))
+
+    def prepare_quality(self, levels):
+        """Build what any of the QualityGovernor LEVELS will draw, before the governor switches to it."""
+        self.fractals.prepare(sorted({settings['fractal_depth'] for settings in levels}))
+
+    def apply_quality(self, settings):
+        """Apply one QualityGovernor level."""
+        self.spawn_scale = settings['spawn_scale']
+        self.particle_cap = min(settings['max_particles'], self.particles.capacity)
+        self.trail_length = settings['trail_length']
+        self.max_depth = settings['fractal_depth']
+        self.wave_step = settings['wave_step']
+        self.background.set_star_count(settings['star_count'])
+
+    def update_particles(self, volume, freq_data, onsets=(), beat_phase=None):
+        """Bubbles form patterns based on frequency.
 
-    def update_particles(self, volume, freq_data):
-        """Bubbles form patterns based on frequency."""
+        Each onset (see AudioAnalysis.get_onsets) fires a radial burst sized by
+        its strength. `beat_phase` makes regular bubbles swell on the beat.
+        """
+        particles = self.particles
+        origin = (self.width // 2, self.height * 0.4)
+        for onset in onsets:
+            strength = min(onset.strength, 4.0)
+            burst = min(int(self.burst_size * strength * self.spawn_scale), self.particle_cap - len(particles))
+            particles.spawn(burst, 'radial', origin, int(12 + strength * 6), self.base_hue, self.time,
+                            strength / 4.0, len(freq_data))
         if volume > 0.1:
             # Analyze frequency bands
             low_freq = np.mean(freq_data[:5])  # Low: 0-4
@@ -102,196 +211,240 @@ class Visualizer:
             dominant = max(low_freq, mid_freq, high_freq)
 
             pattern = 'spiral' if dominant == low_freq else 'radial' if dominant == mid_freq else 'wave'
-            bubble_count = int(volume * 10)
-            
-            for _ in range(bubble_count):
-                hue = (self.base_hue + random.uniform(0, 360)) % 360
-                size = int(10 + volume * 15 + dominant * 10)
-                bubble_surf = self.create_bubble_surface(size, hue)
-                spawn_x = self.width // 2
-                spawn_y = self.height * 0.4
-                
-                if pattern == 'spiral':  # Low freq: tight spiral
-                    angle = self.time * 0.1 + _ * (2 * math.pi / bubble_count)
-                    radius = volume * 50
-                    vel_x = math.cos(angle) * 2
-                    vel_y = math.sin(angle) * 2
-                elif pattern == 'radial':  # Mid freq: starburst
-                    angle = _ * (2 * math.pi / bubble_count)
-                    speed = 2 + volume * 3
-                    vel_x = math.cos(angle) * speed
-                    vel_y = math.sin(angle) * speed
-                else:  # High freq: scattered waves
-                    angle = random.uniform(0, 2 * math.pi)
-                    speed = 1 + volume * 2
-                    vel_x = math.cos(angle) * speed
-                    vel_y = math.sin(angle) * speed * 0.5
-
-                self.particles.append({
-                    'pos': [spawn_x, spawn_y],
-                    'vel': [vel_x, vel_y],
-                    'size': size,
-                    'base_size': size,
-                    'hue': hue,
-                    'surface': bubble_surf,
-                    'life': 90,
-                    'wave_phase': random.uniform(0, 2 * math.pi),
-                    'freq_idx': random.randint(0, len(freq_data) - 1),
-                    'trail': [],
-                    'pattern': pattern
-                })
-
-        self.particle_layer.fill((0, 0, 0, 0))
-        for p in self.particles[:]:
-            freq_amplitude = freq_data[p['freq_idx']] if freq_data.any() else 0.5
-            wave_factor = math.sin(self.time * 0.03 + p['wave_phase']) * freq_amplitude * 1.5
-            
-            if p['pattern'] == 'spiral':
-                p['pos'][0] += p['vel'][0] + wave_factor * 0.5
-                p['pos'][1] += p['vel'][1] + wave_factor * 0.5
-            elif p['pattern'] == 'radial':
-                p['pos'][0] += p['vel'][0]
-                p['pos'][1] += p['vel'][1]
-            else:  # wave
-                p['pos'][0] += p['vel'][0] + wave_factor
-                p['pos'][1] += p['vel'][1] + wave_factor * 0.5
-            
-            p['pos'][1] = min(p['pos'][1], self.height * 0.8)  # Keep above equalizer
-            
-            p['size'] = p['base_size'] * (1 + freq_amplitude * 0.3 * math.sin(self.time * 0.08 + p['wave_phase']))
-            p['hue'] = (p['hue'] + 3 + freq_amplitude * 5) % 360
-            p['surface'] = self.create_bubble_surface(int(p['size']), p['hue'])
-            
-            p['trail'].append((int(p['pos'][0]), int(p['pos'][1])))
-            if len(p['trail']) > 3:
-                p['trail'].pop(0)
-            for i, pos in enumerate(p['trail']):
-                alpha = int(255 * (i + 1) / len(p['trail']) * (p['life'] / 90) * 0.4)
-                pygame.draw.circle(self.particle_layer, (*self._hsv_to_rgb(p['hue'], 1.0, 0.7), alpha), pos, int(p['size'] * 0.3))
-            
-            if p['life'] > 0:
-                surf_size = p['surface'].get_width()
-                self.particle_layer.blit(p['surface'], 
-                                        (int(p['pos'][0] - surf_size // 2), 
-                                         int(p['pos'][1] - surf_size // 2)))
-                p['life'] -= 1
-            else:
-                self.particles.remove(p)
-        self.particle_count = len(self.particles)
+            bubble_count = min(int(volume * 10 * self.spawn_scale), self.particle_cap - len(particles))
+            size = 10 + volume * 15 + dominant * 10
+            if beat_phase is not None:
+                size *= 1 + 0.25 * (1 - beat_phase) ** 2
+            particles.spawn(bubble_count, pattern, origin, int(size), self.base_hue, self.time, volume, len(freq_data))
+
+        particles.step(self.time, freq_data, self.height * 0.8)
+        n = len(particles)
+        if n or self._layer_bounds['particles']:
+            self._clear_layer('particles', self.particle_layer)
+        bounds = None
+        if n:
+            scale = self.layer_scales['particles']
+            life = particles.life[:n]
+            radius = (particles.size[:n] * (0.3 * scale)).astype(int)
+            pad = int(radius.max()) + 1
+            radius = radius.tolist()
+            trail_color = hsv_to_rgb_array(particles.hue[:n], 1.0, 0.7).tolist()
+            trail_length = min(self.trail_length, particles.trail_length)
+            trail_count = np.minimum(particles.trail_count[:n], trail_length)
+            life_factor = life / particles.max_life * 0.4
+            boxes = []
+            for age in range(trail_length - 1, -1, -1):
+                has_point = trail_count > age
+                if not has_point.any():
+                    continue
+                alpha = (255 * (trail_count - age) / np.maximum(trail_count, 1) * life_factor).astype(int)
+                points = particles.trail_points(age)
+                points = points if scale == 1 else (points * scale).astype(int)
+                drawn = points[has_point]
+                boxes.append((*(drawn.min(axis=0) - pad), *(drawn.max(axis=0) + pad)))
+                points = points.tolist()
+                alpha = alpha.tolist()
+                for i in np.flatnonzero(has_point).tolist():
+                    pygame.draw.circle(self.particle_layer, (*trail_color[i], alpha[i]), points[i], radius[i])
+
+            sprite = self.sprite_cache.get
+            sizes = (particles.size[:n] * scale).astype(int)
+            xs = particles.pos[:n, 0] * scale
+            ys = particles.pos[:n, 1] * scale
+            alive = life > 0
+            if alive.any():
+                # Sprites are 2 * size wide and centred on the particle.
+                reach = sizes[alive] + 1
+                boxes.append(((xs[alive] - reach).min(), (ys[alive] - reach).min(),
+                              (xs[alive] + reach).max(), (ys[alive] + reach).max()))
+            sizes = sizes.tolist()
+            hues = particles.hue[:n].tolist()
+            xs = xs.tolist()
+            ys = ys.tolist()
+            blits = []
+            for i in np.flatnonzero(alive).tolist():
+                surf = sprite(sizes[i], hues[i])
+                half = surf.get_width() // 2
+                blits.append((surf, (int(xs[i] - half), int(ys[i] - half))))
+            self.particle_layer.blits(blits, doreturn=False)
+            particles.age()
+            if boxes:
+                boxes = np.array(boxes)
+                bounds = _bounds(*boxes[:, :2].min(axis=0), *boxes[:, 2:].max(axis=0))
+        if n or self._layer_bounds['particles']:
+            self._mark_layer('particles', bounds)
+        self.particle_count = len(particles)
 
     def draw_fractal(self, volume):
-        self.fractal_layer.fill((0, 0, 0, 0))
         self.fractal_size = 120 + volume * 70
         self.color_shift = (self.color_shift + volume * 15) % 360
+        scale = self.layer_scales['fractal']
+        x, y, size = self.fractal_x * scale, self.fractal_y * scale, self.fractal_size * scale
+        key = (self.fractal_type, x, y, size, self.max_depth, self.color_shift)
+        if key == self._layer_keys['fractal']:
+            return
+        self._clear_layer('fractal', self.fractal_layer)
         if self.fractal_type == 'tree':
-            self._draw_branch(self.fractal_layer, self.fractal_x, self.fractal_y,
-                            self.fractal_size, self.max_depth, -math.pi / 2)
+            bounds = self.fractals.draw_tree(self.fractal_layer, x, y, size, self.max_depth, self.color_shift, scale)
         else:
-            p1 = (self.fractal_x, self.fractal_y - self.fractal_size)
-            p2 = (self.fractal_x - self.fractal_size * 0.866, self.fractal_y + self.fractal_size * 0.5)
-            p3 = (self.fractal_x + self.fractal_size * 0.866, self.fractal_y + self.fractal_size * 0.5)
-            self._draw_sierpinski(self.fractal_layer, p1, p2, p3, self.max_depth)
+            bounds = self.fractals.draw_sierpinski(self.fractal_layer, x, y, size, self.max_depth, self.color_shift)
+        self._mark_layer('fractal', bounds, key)
 
-    def _draw_branch(self, surface, x, y, length, depth, angle):
-        if depth <= 0 or length < 2:
-            return
-        end_x = x + math.cos(angle) * length
-        end_y = y - math.sin(angle) * length
-        hue = (self.color_shift + depth * 40) % 360
-        saturation = 0.8 - depth / self.max_depth * 0.2
-        value = 0.9 - depth / self.max_depth * 0.2
-        color = self._hsv_to_rgb(hue, saturation, value)
-        thickness = max(1, int(depth * 1.5))
-        pygame.draw.line(surface, color, (int(x), int(y)), (int(end_x), int(end_y)), thickness)
-        branch_angle = 0.35 + (1 - depth / self.max_depth) * 0.25
-        new_length = length * 0.75
-        self._draw_branch(surface, end_x, end_y, new_length, depth - 1, angle + branch_angle)
-        self._draw_branch(surface, end_x, end_y, new_length, depth - 1, angle - branch_angle)
-
-    def _draw_sierpinski(self, surface, p1, p2, p3, depth):
-        if depth <= 0:
-            hue = (self.color_shift + depth * 50) % 360
-            color = self._hsv_to_rgb(hue, 0.9, 1.0)
-            pygame.draw.polygon(surface, color, [p1, p2, p3])
-            return
-        p12 = ((p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2)
-        p23 = ((p2[0] + p3[0]) / 2, (p2[1] + p3[1]) / 2)
-        p31 = ((p3[0] + p1[0]) / 2, (p3[1] + p1[1]) / 2)
-        self._draw_sierpinski(surface, p1, p12, p31, depth - 1)
-        self._draw_sierpinski(surface, p12, p2, p23, depth - 1)
-        self._draw_sierpinski(surface, p31, p23, p3, depth - 1)
+    def _wave_grid(self, scale):
+        """Sample x positions for the current width and step, and their scaled layer coordinates."""
+        key = (self.width, self.wave_step, scale, len(self.waves))
+        if self._wave_grid_key != key:
+            xs = np.arange(0, self.width + 10, self.wave_step, dtype=float)
+            self._wave_xs = xs
+            self._wave_points = np.empty((len(self.waves), len(xs), 2))
+            self._wave_points[:, :, 0] = xs * scale
+            self._wave_grid_key = key
+        return self._wave_xs
 
     def draw_waves(self, volume):
-        self.wave_layer.fill((0, 0, 0, 0))
-        for wave in self.waves:
-            points = []
-            for x in range(0, self.width + 10, 5):
-                y = self.height // 2 + math.sin(x * wave['frequency'] + self.time * 0.02 + wave['phase']) * wave['amplitude'] * (1 + volume * 1.2)
-                points.append((x, y))
-            if len(points) > 1:
-                pygame.draw.lines(self.wave_layer, wave['color'], False, points, 3)
+        self._clear_layer('waves', self.wave_layer)
+        scale = self.layer_scales['waves']
+        line_width = max(1, round(3 * scale))
+        xs = self._wave_grid(scale)
+        # All waves at once: one (waves, samples) broadcast instead of a sin() call per point.
+        frequency = np.array([wave['frequency'] for wave in self.waves])[:, None]
+        phase = np.array([wave['phase'] for wave in self.waves])[:, None]
+        amplitude = np.array([wave['amplitude'] for wave in self.waves])[:, None]
+        ys = self.height // 2 + np.sin(xs * frequency + self.time * 0.02 + phase) * amplitude * (1 + volume * 1.2)
+        points = self._wave_points
+        points[:, :, 1] = ys * scale
+        bounds = []
+        if len(xs) > 1:
+            for wave, curve in zip(self.waves, points.tolist()):
+                bounds.append(pygame.draw.lines(self.wave_layer, wave['color'], False, curve, line_width))
+        self._mark_layer('waves', bounds[0].unionall(bounds[1:]) if bounds else None)
 
     def draw_equalizer(self, freq_data):
-        self.equalizer_layer.fill((0, 0, 0, 0))
+        scale = self.layer_scales['equalizer']
         bar_width = self.width // (len(freq_data) * 2)
         bar_spacing = bar_width * 1.5
+        blits = []
+        key = []
         for i, amplitude in enumerate(freq_data):
             height = int(amplitude * self.height * 0.5)
             hue = (self.base_hue + i * 30 + self.time * 5) % 360
-            bloom_size = int(bar_width * 0.8 + amplitude * 10)
-            bloom = self.create_bubble_surface(bloom_size, hue)
+            bloom_size = int((bar_width * 0.8 + amplitude * 10) * scale)
+            bloom = self.sprite_cache.get(bloom_size, hue)
             pulse = math.sin(self.time * 0.1 + i) * amplitude * 10
-            x_pos = i * bar_spacing + bar_width // 2
-            y_pos = self.height - height - pulse
-            self.equalizer_layer.blit(bloom, 
-                                    (int(x_pos - bloom_size), 
-                                     int(y_pos - bloom_size // 2)))
-
-    def update(self, volume, freq_data):
-        self.update_particles(volume, freq_data)
-        self.draw_waves(volume)
-        self.draw_fractal(volume)
-        self.draw_equalizer(freq_data)
+            x_pos = (i * bar_spacing + bar_width // 2) * scale
+            y_pos = (self.height - height - pulse) * scale
+            pos = (int(x_pos - bloom_size), int(y_pos - bloom_size // 2))
+            blits.append((bloom, pos))
+            key.append((self.sprite_cache.quantize(bloom_size, hue), pos))
+        # Skip the layer when no bloom changed sprite or position.
+        if key == self._layer_keys['equalizer']:
+            return
+        self._clear_layer('equalizer', self.equalizer_layer)
+        rects = self.equalizer_layer.blits(blits)
+        self._mark_layer('equalizer', rects[0].unionall(rects[1:]) if rects else None, key)
+
+    def update(self, volume, freq_data, onsets=(), beat_phase=None):
+        profiler = self.profiler
+        with profiler.stage('update_particles'):
+            self.update_particles(volume, freq_data, onsets, beat_phase)
+        with profiler.stage('draw_waves'):
+            self.draw_waves(volume)
+        with profiler.stage('draw_fractal'):
+            self.draw_fractal(volume)
+        with profiler.stage('draw_equalizer'):
+            self.draw_equalizer(freq_data)
+        self.sprite_cache.prewarm_step()
         self.time += 1
         self.cosmic_phase += 0.005
-        if random.random() < 0.01:
+        if self.rng.random() < 0.01:
             self.fractal_type = 'sierpinski' if self.fractal_type == 'tree' else 'tree'
 
+    def _scaled_buffer(self, key, size, flags=0, like=None):
+        buffer = self._scaled_buffers.get(key)
+        if buffer is None or buffer.get_size() != size:
+            buffer = pygame.Surface(size, flags, like) if like is not None else pygame.Surface(size, flags)
+            self._scaled_buffers[key] = buffer
+        return buffer
+
+    def _take_dirty(self):
+        """Return and reset the rects invalidated since the last render."""
+        rects = self._invalid
+        for name in LAYERS[1:]:
+            rects.extend(self._dirty[name])
+            self._dirty[name] = []
+        self._invalid = []
+        return rects
+
     def render(self, surface):
+        """Composite all layers onto `surface`, which must be the output size.
+
+        Returns the rects of `surface` that changed, for pygame.display.update().
+        While dirty rectangles are active `surface` must still hold the previous
+        frame: only the regions the layers and backdrop touched since then are
+        recomposited. Otherwise the whole frame is redrawn.
+        """
         try:
-            self.background.fill((5, 5, 15))
-            for x, y, size in self.stars:
-                brightness = (math.sin(self.cosmic_phase + x * 0.01 + y * 0.01) + 1) * 0.5
-                color = (int(200 * brightness), int(220 * brightness), int(255 * brightness))
-                pygame.draw.circle(self.background, color, (x, y), int(size * brightness))
-
-            sun_x, sun_y = self.planets[0]['x'], self.planets[0]['y']
-            for planet in self.planets[1:]:
-                orbit_radius = planet['orbit']
-                for angle in range(0, 360, 10):
-                    x = sun_x + math.cos(math.radians(angle)) * orbit_radius
-                    y = sun_y + math.sin(math.radians(angle)) * orbit_radius
-                    pygame.draw.circle(self.background, (50, 50, 60), (int(x), int(y)), 1)
-
-            for i, planet in enumerate(self.planets[1:], 1):
-                orbit_angle = self.cosmic_phase * (10 / (i + 1))
-                planet['x'] = sun_x + math.cos(orbit_angle) * planet['orbit']
-                planet['y'] = sun_y + math.sin(orbit_angle) * planet['orbit']
-                pygame.draw.circle(self.background, planet['color'], (int(planet['x']), int(planet['y'])), planet['radius'])
-
-            sun_surf = pygame.Surface((80, 80), pygame.SRCALPHA)
-            for r in range(40, 0, -1):
-                alpha = int(100 * (r / 40))
-                pygame.draw.circle(sun_surf, (*self.planets[0]['color'], alpha), (40, 40), r)
-            self.background.blit(sun_surf, (int(sun_x - 40), int(sun_y - 40)))
-
-            surface.blit(self.background, (0, 0))
-            surface.blit(self.wave_layer, (0, 0))
-            surface.blit(self.fractal_layer, (0, 0))
-            surface.blit(self.equalizer_layer, (0, 0))
-            surface.blit(self.particle_layer, (0, 0))
+            if self.dirty_rects_active:
+                return self._render_dirty(surface)
+            self._render_full(surface)
         except Exception as e:
             logging.error(f"Error rendering: {e}")
+        return [surface.get_rect()]
+
+    def _render_dirty(self, surface):
+        bounds = surface.get_rect()
+        sources = (self.background_layer, self.wave_layer, self.fractal_layer,
+                   self.equalizer_layer, self.particle_layer)
+        if self.background_layer is None or self.background_layer.get_size() != bounds.size:
+            # First frame after a resize or mode switch: build the backdrop and present everything.
+            self.background_layer = pygame.Surface(bounds.size, 0, surface)
+            self.background.draw(self.background_layer, self.cosmic_phase)
+            self._background_phase = self.cosmic_phase
+            self._take_dirty()
+            surface.blit(self.background_layer, (0, 0))
+            for layer in sources[1:]:
+                surface.blit(layer, (0, 0))
+            return [bounds]
+        rects = self._take_dirty()
+        if self.cosmic_phase != self._background_phase:
+            rects.extend(self.background.draw_dirty(self.background_layer, self.cosmic_phase))
+            self._background_phase = self.cosmic_phase
+        rects = _merge_rects([rect for rect in (rect.clip(bounds) for rect in rects) if rect])
+        if sum(rect.width * rect.height for rect in rects) > bounds.width * bounds.height * self.full_frame_ratio:
+            # Mostly dirty: whole-layer blits beat many overlapping partial ones.
+            rects = [bounds]
+        surface.blits([(source, rect, rect) for rect in rects for source in sources], doreturn=False)
+        return rects
+
+    def _render_full(self, surface):
+        """Redraw the whole frame. Consecutive layers that share the background's reduced scale are
+        composited at that scale and upscaled once; any other reduced-scale
+        layer is upscaled on its own before being blended in.
+        """
+        self._take_dirty()
+        self.background_layer = None
+        size = surface.get_size()
+        layers = {'waves': self.wave_layer, 'fractal': self.fractal_layer,
+                  'equalizer': self.equalizer_layer, 'particles': self.particle_layer}
+        base_scale = self.layer_scales['background']
+        if base_scale == 1:
+            canvas = surface
+        else:
+            canvas = self._scaled_buffer('canvas', self._layer_size('background'), like=surface)
+        self.background.draw(canvas, self.cosmic_phase)
+        for name in LAYERS[1:]:
+            scale = self.layer_scales[name]
+            if canvas is not surface and scale != base_scale:
+                pygame.transform.scale(canvas, size, surface)
+                canvas = surface
+            if canvas is not surface or scale == 1:
+                canvas.blit(layers[name], (0, 0))
+            else:
+                upscaled = self._scaled_buffer(name, size, pygame.SRCALPHA)
+                pygame.transform.scale(layers[name], size, upscaled)
+                surface.blit(upscaled, (0, 0))
+        if canvas is not surface:
+            pygame.transform.scale(canvas, size, surface)
 
     def quit(self):
         pass
\ No newline at end of file